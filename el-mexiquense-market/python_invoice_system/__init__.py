@@ -8,7 +8,9 @@ Paquete principal
 __version__ = '1.0.0'
 __author__ = 'El Mexiquense Market'
 
-from .inventario import InventarioManager
-from .facturacion import FacturaManager
+from .inventario import InventarioManager, Producto
+from .facturacion import Factura, FacturaManager, LineaFactura
+from .instantanea import InstantaneaCatalogo, exportar_instantanea
 
-__all__ = ['InventarioManager', 'FacturaManager']
+__all__ = ['InventarioManager', 'FacturaManager', 'Producto', 'Factura', 'LineaFactura',
+           'InstantaneaCatalogo', 'exportar_instantanea']
@@ -0,0 +1,651 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pruebas de rendimiento del Sistema de Facturación
+Uso: python benchmarks.py <prueba> [--filas N]
+"""
+
+import argparse
+import csv
+import random
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from facturacion import FacturaManager
+from instantanea import InstantaneaCatalogo, exportar_instantanea
+from inventario import (MOTOR_CSV, InventarioManager, calcular_digito_verificador, leer_csv,
+                        limpiar_productos, validar_productos)
+
+
+def generar_csv_catalogo(ruta, filas, semilla=42, cambios=0.0):
+    """
+    Genera un CSV de catálogo con el formato de importación
+    (UPC, QTY, PRODUCT, PRICE, TOTAL); ~2% de las filas sin UPC y el resto
+    con UPC-A válidos.
+    `cambios` es la fracción de filas cuyo precio cambia respecto a la misma semilla.
+    """
+    aleatorio = random.Random(semilla)
+    aleatorio_cambios = random.Random(semilla + 1)
+    sin_upc = ['CILANTRO', 'AGUACATE', 'LIMON', 'TOMATE', 'CEBOLLA BLANCA']
+
+    with open(ruta, 'w', encoding='utf-8', newline='') as archivo:
+        escritor = csv.writer(archivo)
+        escritor.writerow(['UPC', 'QTY', 'PRODUCT', 'PRICE', 'TOTAL'])
+        for i in range(filas):
+            qty = aleatorio.randint(1, 50)
+            precio = aleatorio.randint(10, 9999) / 100
+            if cambios and aleatorio_cambios.random() < cambios:
+                precio += 0.01
+            if i % 50 == 0:
+                upc = ''
+                producto = aleatorio.choice(sin_upc)
+            else:
+                upc = f'{i:011d}' + calcular_digito_verificador(f'{i:011d}')
+                producto = f'Producto de prueba {i}'
+            escritor.writerow([upc, qty, producto, f'${precio:,.2f}', f'${precio * qty:,.2f}'])
+
+    return ruta
+
+
+def _medir(funcion, repeticiones=3):
+    """Retorna el mejor tiempo (segundos) de varias ejecuciones"""
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        duracion = time.perf_counter() - inicio
+        mejor = duracion if mejor is None else min(mejor, duracion)
+    return mejor
+
+
+def benchmark_lectura_csv(filas=1_000_000):
+    """
+    Compara lectura + limpieza del CSV con tipos inferidos por pandas
+    contra leer_csv (tipos explícitos) con el motor C y con pyarrow
+    """
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = generar_csv_catalogo(Path(directorio) / 'catalogo.csv', filas)
+
+        pruebas = {
+            'pandas C, tipos inferidos': lambda: pd.read_csv(ruta, encoding='utf-8'),
+            'leer_csv motor C': lambda: leer_csv(ruta, 'c'),
+        }
+        if MOTOR_CSV == 'pyarrow':
+            pruebas['leer_csv motor pyarrow'] = lambda: leer_csv(ruta, 'pyarrow')
+        else:
+            print("(pyarrow no está instalado; se omite el motor pyarrow)")
+
+        print(f"\nLectura de CSV con {filas:,} filas")
+        print("-"*72)
+        print(f"{'LECTOR':<30} {'LECTURA':>10} {'+ LIMPIEZA':>12} {'FILAS/S':>16}")
+        print("-"*72)
+        for nombre, leer in pruebas.items():
+            lectura = _medir(leer)
+            total = _medir(lambda: limpiar_productos(leer()))
+            print(f"{nombre:<30} {lectura:>8.3f} s {total:>10.3f} s {filas / total:>16,.0f}")
+
+        df = leer_csv(ruta)
+        validacion = _medir(lambda: validar_productos(df))
+        print(f"{'validar_productos':<30} {validacion:>8.3f} s {'':>12} {filas / validacion:>16,.0f}")
+
+
+def benchmark_importacion(filas=1_000_000):
+    """
+    Mide la importación completa a una base nueva y la reimportación de un
+    archivo con ~2% de precios cambiados, completa y en modo delta
+    """
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = generar_csv_catalogo(Path(directorio) / 'catalogo.csv', filas)
+        ruta_cambios = generar_csv_catalogo(Path(directorio) / 'cambios.csv', filas, cambios=0.02)
+        inventario = InventarioManager(str(Path(directorio) / 'inventario.db'))
+
+        print(f"\nImportación de CSV con {filas:,} filas")
+        print("-"*72)
+        pruebas = [
+            ('Importación inicial', lambda: inventario.importar_desde_csv(ruta)),
+            ('Reimportación completa', lambda: inventario.importar_desde_csv(ruta_cambios)),
+            ('Reimportación delta (sin cambios)', lambda: inventario.importar_desde_csv(ruta_cambios, delta=True)),
+            ('Reimportación delta (2% cambios)', lambda: inventario.importar_desde_csv(ruta, delta=True)),
+        ]
+        for nombre, importar in pruebas:
+            resultado = importar()
+            print(f"{nombre:<36} {resultado['duracion_segundos']:>8.3f} s "
+                  f"{resultado['filas_por_segundo']:>14,.0f} filas/s")
+
+        inventario.cerrar()
+
+
+def benchmark_importacion_multiple(filas=1_000_000, archivos=8):
+    """
+    Importa `archivos` CSV que suman `filas` filas con un solo proceso y
+    con un proceso de lectura por núcleo
+    """
+    with tempfile.TemporaryDirectory() as directorio:
+        carpeta = Path(directorio) / 'proveedores'
+        carpeta.mkdir()
+        for i in range(archivos):
+            generar_csv_catalogo(carpeta / f'proveedor_{i:02d}.csv', filas // archivos, semilla=i)
+
+        print(f"\nImportación de {archivos} archivos con {filas:,} filas en total")
+        print("-"*72)
+        for procesos in (1, None):
+            inventario = InventarioManager(str(Path(directorio) / f'inventario_{procesos}.db'))
+            resultado = inventario.importar_archivos(str(carpeta), procesos=procesos)
+            print(f"{resultado['procesos']:>2} proceso(s) {resultado['duracion_segundos']:>12.3f} s "
+                  f"{resultado['filas_por_segundo']:>14,.0f} filas/s")
+            inventario.cerrar()
+
+
+def _crear_catalogo(directorio, filas):
+    """Genera e importa un catálogo de `filas` productos; retorna el InventarioManager"""
+    ruta = generar_csv_catalogo(Path(directorio) / 'catalogo.csv', filas)
+    inventario = InventarioManager(str(Path(directorio) / 'inventario.db'))
+    resultado = inventario.importar_desde_csv(ruta)
+    print(f"Catálogo de {filas:,} filas importado en {resultado['duracion_segundos']:.2f} s")
+    return inventario
+
+
+def benchmark_busqueda_upc(filas=1_000_000, consultas=('12345', '0009999', '999', 'CILANTRO', '4567890123')):
+    """
+    Compara buscar_por_upc_parcial (índice de trigramas) contra el
+    LIKE '%x%' sin índice y verifica que regresen las mismas filas
+    """
+    with tempfile.TemporaryDirectory() as directorio:
+        inventario = _crear_catalogo(directorio, filas)
+        cursor = inventario.conn.cursor()
+        consulta_sin_indice = '''
+            SELECT upc, producto, precio, qty FROM productos
+            WHERE UPPER(upc) LIKE UPPER(?) ORDER BY upc
+        '''
+
+        print(f"\nBúsqueda de UPC parcial en {filas:,} productos")
+        print("-"*72)
+        print(f"{'CONSULTA':<14} {'FILAS':>8} {'SIN ÍNDICE':>14} {'TRIGRAMAS':>14} {'IGUALES':>10}")
+        print("-"*72)
+        for consulta in consultas:
+            sin_indice = _medir(lambda: cursor.execute(consulta_sin_indice, (f'%{consulta}%',)).fetchall())
+            con_indice = _medir(lambda: inventario.buscar_por_upc_parcial(consulta))
+            esperadas = cursor.execute(consulta_sin_indice, (f'%{consulta}%',)).fetchall()
+            obtenidas = [tuple(p.values()) for p in inventario.buscar_por_upc_parcial(consulta)]
+            print(f"{consulta:<14} {len(esperadas):>8,} {sin_indice * 1000:>11.2f} ms "
+                  f"{con_indice * 1000:>11.2f} ms {str(esperadas == obtenidas):>10}")
+
+        print(f"\n{'PREFIJO (limite=20)':<22} {'FILAS':>8} {'TIEMPO':>14}")
+        print("-"*72)
+        exacto = f'{123457:011d}' + calcular_digito_verificador(f'{123457:011d}')
+        for consulta in ('00000123', exacto, 'CIL', '5', '4567'):
+            duracion = _medir(lambda: inventario.buscar_por_upc_parcial(consulta, 'prefijo', 20))
+            encontrados = inventario.buscar_por_upc_parcial(consulta, 'prefijo', 20)
+            print(f"{consulta:<22} {len(encontrados):>8,} {duracion * 1000:>11.3f} ms")
+        
+        print(f"\n{'ESCANEO EXACTO':<22} {'UPC ENCONTRADO':>16} {'TIEMPO':>14}")
+        print("-"*72)
+        for consulta in (exacto, '0' + exacto, exacto[1:], exacto.zfill(14), 'CILANTRO001'):
+            duracion = _medir(lambda: inventario._obtener_producto_por_upc(consulta), repeticiones=100)
+            producto = inventario.obtener_producto_por_upc(consulta)
+            print(f"{consulta:<22} {producto['upc'] if producto else '-':>16} {duracion * 1e6:>11.1f} µs")
+
+        inventario.cerrar()
+
+
+def benchmark_indice_memoria(filas=1_000_000, consultas=('12345', '0009999', '4567890123', 'CILANTRO', '99')):
+    """
+    Mide construcción, memoria y tiempo de consulta del índice de trigramas en
+    memoria (IndiceUPC) contra el índice FTS5 de SQLite, y la búsqueda completa
+    de buscar_por_upc_parcial con cada uno
+    """
+    with tempfile.TemporaryDirectory() as directorio:
+        inventario = _crear_catalogo(directorio, filas)
+
+        inicio = time.perf_counter()
+        indice = inventario.activar_indice_memoria()
+        construccion = time.perf_counter() - inicio
+        print(f"Índice en memoria: {len(indice):,} UPC, construido en {construccion:.2f} s, "
+              f"{indice.memoria() / 2**20:,.1f} MiB")
+
+        print(f"\n{'CONSULTA':<14} {'FILAS':>8} {'IndiceUPC':>12} {'FTS5':>12} "
+              f"{'BÚSQUEDA':>12} {'IGUALES':>8}")
+        print("-"*72)
+        for consulta in consultas:
+            en_memoria = _medir(lambda: indice.buscar(consulta), repeticiones=20)
+            completa = _medir(lambda: inventario.buscar_por_upc_parcial(consulta))
+            obtenidas = inventario.buscar_por_upc_parcial(consulta)
+
+            inventario.indice_upc = None
+            fts = _medir(lambda: inventario.buscar_por_upc_parcial(consulta))
+            esperadas = inventario.buscar_por_upc_parcial(consulta)
+            inventario.indice_upc = indice
+
+            print(f"{consulta:<14} {len(obtenidas):>8,} {en_memoria * 1e6:>9.0f} µs "
+                  f"{fts * 1000:>9.2f} ms {completa * 1000:>9.2f} ms {str(obtenidas == esperadas):>8}")
+
+        # Actualización incremental al importar productos nuevos
+        ruta = generar_csv_catalogo(Path(directorio) / 'nuevos.csv', 1000, semilla=7)
+        nuevos = pd.read_csv(ruta, dtype=str)
+        nuevos['UPC'] = 'N' + nuevos['UPC'].fillna('')
+        nuevos.to_csv(ruta, index=False)
+        resultado = inventario.importar_desde_csv(ruta, validar=False)
+        print(f"\nImportación de {resultado['productos_procesados']:,} productos nuevos: "
+              f"{len(indice.pendientes):,} pendientes en el índice, "
+              f"'N0000' -> {len(indice.buscar('N0000')):,} coincidencias")
+
+        inventario.cerrar()
+
+
+def _medir_memoria(funcion):
+    """Retorna (pico de memoria en bytes, bloques asignados) al ejecutar funcion()"""
+    tracemalloc.start()
+    try:
+        resultado = funcion()
+        pico = tracemalloc.get_traced_memory()[1]
+        bloques = len(tracemalloc.take_snapshot().traces)
+    finally:
+        tracemalloc.stop()
+    del resultado
+    return pico, bloques
+
+
+def benchmark_registros(filas=1_000_000):
+    """
+    Compara tiempo, memoria pico y bloques asignados al leer el catálogo y el
+    detalle de una factura de `filas` líneas como diccionarios, tuplas y
+    registros con __slots__ (Producto, LineaFactura)
+    """
+    with tempfile.TemporaryDirectory() as directorio:
+        inventario = _crear_catalogo(directorio, filas)
+        
+        # Una factura con una línea por producto del catálogo
+        facturas = FacturaManager(inventario.db_path)
+        cursor = facturas.conn.cursor()
+        cursor.execute("INSERT INTO facturas (fecha, cliente, subtotal, total) VALUES ('2024-01-01', 'Prueba', 0, 0)")
+        factura_id = cursor.lastrowid
+        cursor.execute('''
+            INSERT INTO detalle_factura (factura_id, upc, producto, precio, qty, total)
+            SELECT ?, upc, producto, precio, 1, precio FROM productos
+        ''', (factura_id,))
+        facturas.conn.commit()
+        
+        pruebas = [
+            ('obtener_todos_productos dict', lambda: inventario.obtener_todos_productos()),
+            ('obtener_todos_productos tupla', lambda: inventario.obtener_todos_productos('tupla')),
+            ('obtener_todos_productos registro', lambda: inventario.obtener_todos_productos('registro')),
+            ('iterar_productos dict', lambda: sum(1 for _ in inventario.iterar_productos())),
+            ('iterar_productos registro', lambda: sum(1 for _ in inventario.iterar_productos(formato='registro'))),
+            ('obtener_factura dict', lambda: facturas.obtener_factura(factura_id)),
+            ('obtener_factura registro', lambda: facturas.obtener_factura(factura_id, 'registro')),
+        ]
+        
+        print(f"\n{'LECTURA':<34} {'TIEMPO':>10} {'MEMORIA PICO':>14} {'BLOQUES':>12}")
+        print("-"*72)
+        for nombre, funcion in pruebas:
+            duracion = _medir(funcion, repeticiones=1)
+            pico, bloques = _medir_memoria(funcion)
+            print(f"{nombre:<34} {duracion:>8.2f} s {pico / 2**20:>10.1f} MiB {bloques:>12,}")
+        
+        facturas.cerrar()
+        inventario.cerrar()
+
+
+def benchmark_instantanea(filas=1_000_000):
+    """
+    Mide la exportación de la instantánea binaria, el tiempo de abrirla contra
+    abrir la base SQLite y las consultas exactas (encontradas, descartadas por
+    el filtro de Bloom) y por prefijo contra InventarioManager
+    """
+    with tempfile.TemporaryDirectory() as directorio:
+        inventario = _crear_catalogo(directorio, filas)
+        ruta = Path(directorio) / 'catalogo.inst'
+        resultado = exportar_instantanea(inventario.db_path, ruta)
+        print(f"Instantánea de {resultado['productos']:,} productos: {resultado['bytes'] / 2**20:,.1f} MiB, "
+              f"exportada en {resultado['duracion_segundos']:.2f} s")
+        
+        apertura = _medir(lambda: InstantaneaCatalogo(ruta).cerrar(), repeticiones=20)
+        apertura_db = _medir(lambda: InventarioManager(inventario.db_path).cerrar(), repeticiones=20)
+        print(f"Apertura: instantánea {apertura * 1e6:,.0f} µs, SQLite {apertura_db * 1e6:,.0f} µs")
+        
+        catalogo = InstantaneaCatalogo(ruta)
+        exacto = f'{123457:011d}' + calcular_digito_verificador(f'{123457:011d}')
+        print(f"\n{'CONSULTA':<22} {'ENCONTRADO':>14} {'INSTANTÁNEA':>14} {'SQLITE':>12} {'IGUALES':>8}")
+        print("-"*72)
+        for consulta in (exacto, '0' + exacto, 'CILANTRO001', '999999999999', 'NO-EXISTE'):
+            en_archivo = _medir(lambda: catalogo.buscar(consulta), repeticiones=100)
+            en_sqlite = _medir(lambda: inventario._obtener_producto_por_upc(consulta), repeticiones=100)
+            producto = catalogo.buscar(consulta)
+            iguales = producto == inventario._obtener_producto_por_upc(consulta)
+            print(f"{consulta:<22} {producto['upc'] if producto else '-':>14} {en_archivo * 1e6:>11.1f} µs "
+                  f"{en_sqlite * 1e6:>9.1f} µs {str(iguales):>8}")
+        
+        prefijo = exacto[:9]
+        en_archivo = _medir(lambda: catalogo.buscar_por_prefijo(prefijo, 20), repeticiones=100)
+        en_sqlite = _medir(lambda: inventario._buscar_por_prefijo_upc(prefijo, 20), repeticiones=100)
+        print(f"{'prefijo ' + prefijo:<22} {len(catalogo.buscar_por_prefijo(prefijo, 20)):>14} "
+              f"{en_archivo * 1e6:>11.1f} µs {en_sqlite * 1e6:>9.1f} µs")
+        
+        catalogo.cerrar()
+        inventario.cerrar()
+
+
+def _facturas_de_prueba(cantidad, lineas, semilla=42):
+    """Genera `cantidad` facturas de `lineas` líneas para guardar_facturas"""
+    aleatorio = random.Random(semilla)
+    return [
+        {
+            'fecha': '2024-01-01',
+            'cliente': f'Cliente {i}',
+            'items': [
+                {'upc': f'{aleatorio.randint(1, 999999):012d}', 'producto': f'Producto {j}',
+                 'precio': aleatorio.randint(10, 9999) / 100, 'qty': aleatorio.randint(1, 10)}
+                for j in range(lineas)
+            ]
+        }
+        for i in range(cantidad)
+    ]
+
+
+def _guardar_por_linea(facturas, factura):
+    """Guarda una factura como lo hacía guardar_factura antes: un INSERT por línea"""
+    cursor = facturas.conn.cursor()
+    subtotal = sum(item['precio'] * item['qty'] for item in factura['items'])
+    cursor.execute('''
+        INSERT INTO facturas (fecha, cliente, subtotal, credito, total)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (factura['fecha'], factura['cliente'], subtotal, 0.0, subtotal))
+    factura_id = cursor.lastrowid
+    for item in factura['items']:
+        cursor.execute('''
+            INSERT INTO detalle_factura (factura_id, upc, producto, precio, qty, total)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (factura_id, item['upc'], item['producto'], item['precio'], item['qty'],
+              item['precio'] * item['qty']))
+    facturas.conn.commit()
+
+
+def _guardar_con_factura_actual(facturas, factura):
+    """Guarda una factura con agregar_item + guardar_factura"""
+    facturas.nueva_factura()
+    for item in factura['items']:
+        facturas.agregar_item(item['upc'], item['producto'], item['precio'], item['qty'])
+    facturas.guardar_factura(factura['fecha'], factura['cliente'])
+
+
+def benchmark_facturas(filas=100_000):
+    """
+    Guarda `filas` líneas de factura repartidas en facturas de mostrador
+    (20 líneas) y de mayoreo (5,000 líneas): un INSERT por línea y commit por
+    factura (como antes), executemany con commit por factura, y todas las
+    facturas en una transacción con guardar_facturas
+    """
+    with tempfile.TemporaryDirectory() as directorio:
+        print(f"\nGuardado de {filas:,} líneas de factura")
+        print("-"*72)
+        print(f"{'ESCENARIO':<30} {'MÉTODO':<22} {'TIEMPO':>8} {'FACTURAS/S':>12}")
+        print("-"*72)
+        for escenario, lineas in (('mostrador (20 líneas)', 20), ('mayoreo (5,000 líneas)', 5000)):
+            lote = _facturas_de_prueba(max(1, filas // lineas), lineas)
+            metodos = [
+                ('INSERT por línea', lambda facturas: [_guardar_por_linea(facturas, f) for f in lote]),
+                ('guardar_factura', lambda facturas: [_guardar_con_factura_actual(facturas, f) for f in lote]),
+                ('guardar_facturas', lambda facturas: facturas.guardar_facturas(lote)),
+            ]
+            for numero, (metodo, guardar) in enumerate(metodos):
+                facturas = FacturaManager(str(Path(directorio) / f'facturas_{lineas}_{numero}.db'))
+                inicio = time.perf_counter()
+                guardar(facturas)
+                duracion = time.perf_counter() - inicio
+                facturas.cerrar()
+                print(f"{escenario:<30} {metodo:<22} {duracion:>6.2f} s {len(lote) / duracion:>12,.0f}")
+
+
+def benchmark_carrito(filas=10_000):
+    """
+    Arma un carrito de `filas` líneas y mide el subtotal al día del Carrito
+    contra volver a sumar todas las líneas, y agregar/cambiar/quitar una línea
+    """
+    facturas = FacturaManager(':memory:')
+    lineas = _facturas_de_prueba(1, filas)[0]['items']
+    for numero, item in enumerate(lineas):
+        facturas.agregar_item(f'{numero:012d}', item['producto'], item['precio'], item['qty'])
+    
+    upc = f'{filas // 2:012d}'
+    linea = facturas.factura_actual.obtener(upc)
+    pruebas = [
+        ('sumar todas las líneas', lambda: sum(item['total'] for item in facturas.factura_actual)),
+        ('calcular_subtotal', facturas.calcular_subtotal),
+        ('agregar UPC repetido', lambda: facturas.agregar_item(upc, linea['producto'], linea['precio'], 1)),
+        ('actualizar_item', lambda: facturas.actualizar_item(upc, 3)),
+        ('quitar_item + agregar_item', lambda: (facturas.quitar_item(upc),
+                                                facturas.agregar_item(upc, 'x', 1.0, 1))),
+    ]
+    
+    print(f"\nCarrito de {len(facturas.factura_actual):,} líneas")
+    print("-"*72)
+    for nombre, funcion in pruebas:
+        duracion = _medir(funcion, repeticiones=1000)
+        print(f"{nombre:<30} {duracion * 1e6:>10.2f} µs")
+    
+    esperado = sum(item['total'] for item in facturas.factura_actual)
+    print(f"Subtotal al día: {facturas.calcular_subtotal():,.2f} (suma completa: {esperado:,.2f})")
+    facturas.cerrar()
+
+
+def benchmark_centavos(filas=1_000_000):
+    """
+    Guarda `filas` líneas de factura (facturas de 20 líneas) y compara sumar
+    las columnas REAL contra las columnas en centavos: tiempo del SUM() y
+    diferencia contra el total exacto
+    """
+    with tempfile.TemporaryDirectory() as directorio:
+        facturas = FacturaManager(str(Path(directorio) / 'facturas.db'))
+        lote = _facturas_de_prueba(max(1, filas // 20), 20)
+        facturas.guardar_facturas(lote)
+        cursor = facturas.conn.cursor()
+        
+        exacto = cursor.execute('SELECT SUM(total_centavos) FROM detalle_factura').fetchone()[0]
+        consultas = [
+            ('SUM(total) REAL', 'SELECT SUM(total) FROM detalle_factura', 1),
+            ('SUM(total_centavos)', 'SELECT SUM(total_centavos) FROM detalle_factura', 100),
+            ('SUM(total) facturas', 'SELECT SUM(total) FROM facturas', 1),
+            ('SUM(total_centavos) facturas', 'SELECT SUM(total_centavos) FROM facturas', 100),
+        ]
+        
+        print(f"\nSumas sobre {filas:,} líneas de factura (total exacto: ${exacto / 100:,.2f})")
+        print("-"*72)
+        print(f"{'CONSULTA':<32} {'TIEMPO':>10} {'DIFERENCIA CONTRA EXACTO':>28}")
+        print("-"*72)
+        for nombre, consulta, divisor in consultas:
+            duracion = _medir(lambda: cursor.execute(consulta).fetchone(), repeticiones=5)
+            diferencia = cursor.execute(consulta).fetchone()[0] / divisor - exacto / 100
+            print(f"{nombre:<32} {duracion * 1000:>7.1f} ms {diferencia:>28.10f}")
+        
+        flotante = sum(item['precio'] * item['qty'] for factura in lote for item in factura['items'])
+        print(f"Suma en Python con flotantes (como antes): diferencia {flotante - exacto / 100:.10f}")
+        facturas.cerrar()
+
+
+# Prueba de concurrencia: procesos que guardan facturas a la vez (cajas) y
+# productos del catálogo que se venden
+CAJAS_ESTRES = 4
+PRODUCTOS_ESTRES = 50
+
+
+def _caja_estres(db_path, facturas, semilla, opciones):
+    """
+    Una caja de benchmark_concurrencia: guarda `facturas` facturas de 1 a 5
+    líneas descontando inventario sin permitir negativos. Retorna lo guardado
+    (facturas, centavos y milésimas vendidas por UPC) y los errores.
+    """
+    aleatorio = random.Random(semilla)
+    manager = FacturaManager(db_path, descontar_inventario=True, permitir_negativo=False, **opciones)
+    resultado = {'guardadas': 0, 'rechazadas': 0, 'errores': [], 'total_centavos': 0,
+                 'vendido': {}, 'reintentos': 0}
+    
+    for _ in range(facturas):
+        manager.nueva_factura()
+        for _ in range(aleatorio.randint(1, 5)):
+            numero = aleatorio.randint(1, PRODUCTOS_ESTRES)
+            manager.agregar_item(f'{numero:012d}', f'Producto {numero}', numero / 4, aleatorio.randint(1, 3))
+        guardado = manager.guardar_factura('2024-01-01', 'Estrés')
+        
+        if guardado['success']:
+            resultado['guardadas'] += 1
+            resultado['total_centavos'] += manager.factura_actual.subtotal_centavos
+            for linea in manager.factura_actual:
+                resultado['vendido'][linea['upc']] = (resultado['vendido'].get(linea['upc'], 0)
+                                                      + linea['qty_milesimas'])
+        elif guardado['error'].startswith('Inventario insuficiente'):
+            resultado['rechazadas'] += 1
+        else:
+            resultado['errores'].append(guardado['error'])
+    
+    resultado['reintentos'] = manager.reintentos_por_bloqueo
+    manager.cerrar()
+    return resultado
+
+
+def _precios_estres(db_path, cambios, opciones):
+    """Cambia precios y consulta productos mientras las cajas guardan; retorna los errores"""
+    inventario = InventarioManager(db_path, tamano_cache=0, **opciones)
+    errores = []
+    for cambio in range(cambios):
+        upc = f'{cambio % PRODUCTOS_ESTRES + 1:012d}'
+        try:
+            inventario.actualizar_precio(upc, cambio % 100 / 4)
+            inventario.obtener_producto_por_upc(upc)
+        except Exception as e:
+            errores.append(str(e))
+    inventario.conn.close()
+    return errores
+
+
+def correr_estres(db_path, facturas_por_caja, opciones, cajas=CAJAS_ESTRES, existencia=None):
+    """
+    Crea en `db_path` un catálogo de PRODUCTOS_ESTRES productos con
+    `existencia` piezas cada uno (por omisión una décima parte de las
+    facturas) y hace que `cajas` procesos guarden `facturas_por_caja`
+    facturas cada uno mientras otro cambia precios.
+    Retorna lo que reportaron los procesos (intentadas, guardadas,
+    rechazadas, fallidas, errores, reintentos, total_centavos y milésimas vendidas por
+    UPC) junto con lo que quedó en la base (facturas_db, total_db y
+    existencias en milésimas), para comparar ambos (ver test_concurrencia.py).
+    """
+    if existencia is None:
+        existencia = max(1, facturas_por_caja * cajas // 10)
+    
+    inventario = InventarioManager(db_path, **opciones)
+    inventario.conn.executemany(
+        'INSERT INTO productos (upc, producto, precio, qty) VALUES (?, ?, ?, ?)',
+        [(f'{i:012d}', f'Producto {i}', i / 4, existencia) for i in range(1, PRODUCTOS_ESTRES + 1)])
+    inventario.conn.commit()
+    FacturaManager(db_path, **opciones).cerrar()  # crea las tablas de facturas antes de abrir las cajas
+    
+    inicio = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=cajas + 1) as ejecutor:
+        precios = ejecutor.submit(_precios_estres, db_path, facturas_por_caja, opciones)
+        procesos = [ejecutor.submit(_caja_estres, db_path, facturas_por_caja, semilla, opciones)
+                    for semilla in range(cajas)]
+        resultados = [proceso.result() for proceso in procesos]
+        errores_precios = precios.result()
+    duracion = time.perf_counter() - inicio
+    
+    vendido = {}
+    for r in resultados:
+        for upc, milesimas in r['vendido'].items():
+            vendido[upc] = vendido.get(upc, 0) + milesimas
+    
+    cursor = inventario.conn.cursor()
+    facturas_db, total_db = cursor.execute(
+        'SELECT COUNT(*), COALESCE(SUM(total_centavos), 0) FROM facturas').fetchone()
+    existencias = dict(cursor.execute('SELECT upc, CAST(ROUND(qty * 1000) AS INTEGER) FROM productos'))
+    inventario.conn.close()
+    
+    return {
+        'duracion': duracion,
+        'intentadas': facturas_por_caja * cajas,
+        'guardadas': sum(r['guardadas'] for r in resultados),
+        'rechazadas': sum(r['rechazadas'] for r in resultados),
+        'fallidas': sum(len(r['errores']) for r in resultados),
+        'errores': [e for r in resultados for e in r['errores']] + errores_precios,
+        'reintentos': sum(r['reintentos'] for r in resultados),
+        'total_centavos': sum(r['total_centavos'] for r in resultados),
+        'vendido': vendido,
+        'existencia_inicial': existencia * 1000,
+        'facturas_db': facturas_db,
+        'total_db': total_db,
+        'existencias': existencias,
+    }
+
+
+def benchmark_concurrencia(filas=2_000):
+    """
+    Prueba de estrés con varios procesos escribiendo en la misma base:
+    CAJAS_ESTRES cajas guardan `filas` facturas en total descontando
+    inventario (sin negativos) mientras otro proceso cambia precios (ver
+    correr_estres). Mide facturas por segundo, rechazos por existencia,
+    errores y reintentos; test_concurrencia.py comprueba que lo guardado cuadre.
+    El último modo baja busy_timeout a 1 ms para forzar los reintentos; ahí
+    algunas facturas pueden agotarlos y fallar.
+    """
+    modos = [
+        ('sin modo concurrente', {}),
+        ('concurrente', {'concurrente': True}),
+        ('concurrente, espera 1 ms', {'concurrente': True, 'espera_bloqueo': 0.001}),
+    ]
+    por_caja = max(1, filas // CAJAS_ESTRES)
+    existencia = max(1, por_caja * CAJAS_ESTRES // 10)
+    
+    print(f"\n{CAJAS_ESTRES} cajas x {por_caja:,} facturas, {PRODUCTOS_ESTRES} productos "
+          f"con {existencia:,} piezas cada uno")
+    print("-"*90)
+    print(f"{'MODO':<26} {'TIEMPO':>8} {'FACT/S':>8} {'GUARDADAS':>10} {'SIN EXIST.':>10} "
+          f"{'ERRORES':>8} {'REINTENTOS':>10}")
+    print("-"*90)
+    
+    with tempfile.TemporaryDirectory() as directorio:
+        for numero, (modo, opciones) in enumerate(modos):
+            db_path = str(Path(directorio) / f'concurrencia_{numero}.db')
+            estres = correr_estres(db_path, por_caja, opciones, existencia=existencia)
+            
+            duracion = estres['duracion']
+            print(f"{modo:<26} {duracion:>6.2f} s {estres['guardadas'] / duracion:>8,.0f} "
+                  f"{estres['guardadas']:>10,} {estres['rechazadas']:>10,} "
+                  f"{len(estres['errores']):>8,} {estres['reintentos']:>10,}")
+            for error in sorted(set(estres['errores']))[:3]:
+                print(f"    error: {error}")
+
+
+PRUEBAS = {
+    'lectura_csv': benchmark_lectura_csv,
+    'importacion': benchmark_importacion,
+    'importacion_multiple': benchmark_importacion_multiple,
+    'busqueda_upc': benchmark_busqueda_upc,
+    'indice_memoria': benchmark_indice_memoria,
+    'registros': benchmark_registros,
+    'instantanea': benchmark_instantanea,
+    'facturas': benchmark_facturas,
+    'carrito': benchmark_carrito,
+    'centavos': benchmark_centavos,
+    'concurrencia': benchmark_concurrencia,
+}
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='Pruebas de rendimiento')
+    parser.add_argument('prueba', choices=sorted(PRUEBAS))
+    parser.add_argument('--filas', type=int,
+                        help='filas o facturas de la prueba (por omisión, las de cada prueba)')
+    args = parser.parse_args()
+
+    if args.filas is None:
+        PRUEBAS[args.prueba]()
+    else:
+        PRUEBAS[args.prueba](args.filas)
+
+
+if __name__ == "__main__":
+    main()
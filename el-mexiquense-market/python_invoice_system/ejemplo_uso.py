@@ -45,6 +45,11 @@ def ejemplo_completo():
     for prod in productos_cilantro:
         print(f"      - {prod['upc']}: {prod['producto']} (${prod['precio']:.2f})")
     
+    print("\n   Buscando productos por nombre 'cheese'...")
+    productos_cheese = inventario.buscar_por_nombre('cheese', limite=3)
+    for prod in productos_cheese:
+        print(f"      - {prod['upc']}: {prod['producto']} (${prod['precio']:.2f})")
+    
     # 5. Crear una factura con 3 productos
     print("\n5. Creando nueva factura con 3 productos...")
     factura_manager.nueva_factura()
@@ -6,8 +6,10 @@ El Mexiquense Market
 """
 
 import sqlite3
+import time
 import pandas as pd
 from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
 from pathlib import Path
 from reportlab.lib.pagesizes import letter
 from reportlab.lib import colors
@@ -15,20 +17,292 @@ from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.units import inch
 
+# Dentro del paquete se importa relativo; como script (main.py, benchmarks.py) desde la carpeta
+try:
+    from .inventario import (ESPERA_BLOQUEO, REINTENTOS_ESCRITURA, conectar_db,
+                             escribir_con_reintentos, guardar_version_esquema,
+                             version_esquema)
+except ImportError:
+    from inventario import (ESPERA_BLOQUEO, REINTENTOS_ESCRITURA, conectar_db,
+                            escribir_con_reintentos, guardar_version_esquema,
+                            version_esquema)
+
+
+# Formatos en que obtener_factura y listar_facturas entregan los resultados
+FORMATOS_FACTURA = ('dict', 'registro')
+
+# Los importes se guardan y se suman en centavos enteros y las cantidades en
+# milésimas (productos a granel), así los totales y los SUM() son exactos
+CENTAVOS_POR_PESO = 100
+MILESIMAS_POR_UNIDAD = 1000
+
+# UPDATE ... FROM (SQLite 3.33) con RETURNING (SQLite 3.35); con versiones
+# anteriores _descontar_inventario usa una subconsulta correlacionada
+DESCUENTO_UPDATE_FROM = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+# Versión de las tablas de facturas (ver inventario.version_esquema); al abrir
+# una base con una versión menor se corre _migrar_centavos
+VERSION_FACTURAS = 1
+
+# Columnas enteras que _migrar_centavos agrega a una base anterior
+COLUMNAS_CENTAVOS = {
+    'facturas': ('subtotal_centavos', 'credito_centavos', 'total_centavos'),
+    'detalle_factura': ('precio_centavos', 'qty_milesimas', 'total_centavos'),
+}
+
+
+def a_centavos(importe):
+    """Convierte un importe en pesos a centavos enteros (redondeo a la mitad hacia arriba)"""
+    return int(Decimal(str(importe)).scaleb(2).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def a_milesimas(qty):
+    """Convierte una cantidad a milésimas enteras (redondeo a la mitad hacia arriba)"""
+    return int(Decimal(str(qty)).scaleb(3).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def total_linea_centavos(precio_centavos, qty_milesimas):
+    """Total de una línea en centavos, redondeado al centavo más cercano"""
+    return (precio_centavos * qty_milesimas + MILESIMAS_POR_UNIDAD // 2) // MILESIMAS_POR_UNIDAD
+
+
+def cantidad_de_milesimas(qty_milesimas):
+    """Cantidad para mostrar: entera si no tiene fracción, si no con decimales"""
+    if qty_milesimas % MILESIMAS_POR_UNIDAD == 0:
+        return qty_milesimas // MILESIMAS_POR_UNIDAD
+    return qty_milesimas / MILESIMAS_POR_UNIDAD
+
+
+def linea_en_centavos(item):
+    """
+    Completa un item (upc, producto, precio, qty) con precio_centavos,
+    qty_milesimas y total_centavos; los de Carrito ya los traen
+    """
+    if 'total_centavos' in item:
+        return item
+    precio_centavos = a_centavos(item['precio'])
+    qty_milesimas = a_milesimas(item['qty'])
+    total_centavos = total_linea_centavos(precio_centavos, qty_milesimas)
+    return {**item,
+            'precio': precio_centavos / CENTAVOS_POR_PESO,
+            'qty': cantidad_de_milesimas(qty_milesimas),
+            'total': total_centavos / CENTAVOS_POR_PESO,
+            'precio_centavos': precio_centavos,
+            'qty_milesimas': qty_milesimas,
+            'total_centavos': total_centavos}
+
+
+class LineaFactura:
+    """Línea de una factura como registro ligero (sin el diccionario de atributos)"""
+    
+    __slots__ = ('upc', 'producto', 'precio', 'qty', 'total')
+    
+    def __init__(self, upc, producto, precio, qty, total):
+        self.upc = upc
+        self.producto = producto
+        self.precio = precio
+        self.qty = qty
+        self.total = total
+    
+    def __repr__(self):
+        return (f'LineaFactura({self.upc!r}, {self.producto!r}, {self.precio!r}, '
+                f'{self.qty!r}, {self.total!r})')
+    
+    def __eq__(self, otro):
+        if not isinstance(otro, LineaFactura):
+            return NotImplemented
+        return self.a_dict() == otro.a_dict()
+    
+    # Registro mutable que se compara por valor: no es hashable a propósito
+    # (un hash por valor cambiaría al modificar sus campos)
+    __hash__ = None
+    
+    def a_dict(self):
+        """Retorna la línea con el formato de diccionario de FacturaManager"""
+        return {'upc': self.upc, 'producto': self.producto, 'precio': self.precio,
+                'qty': self.qty, 'total': self.total}
+
+
+class Factura:
+    """
+    Factura guardada como registro ligero. `items` es la lista de LineaFactura
+    (None en los resultados de listar_facturas, que no leen el detalle).
+    """
+    
+    __slots__ = ('id', 'fecha', 'cliente', 'subtotal', 'credito', 'total', 'created_at', 'items')
+    
+    def __init__(self, id, fecha, cliente, subtotal, credito, total, created_at=None, items=None):
+        self.id = id
+        self.fecha = fecha
+        self.cliente = cliente
+        self.subtotal = subtotal
+        self.credito = credito
+        self.total = total
+        self.created_at = created_at
+        self.items = items
+    
+    def __repr__(self):
+        return f'Factura({self.id!r}, {self.fecha!r}, {self.cliente!r}, total={self.total!r})'
+    
+    def __eq__(self, otro):
+        if not isinstance(otro, Factura):
+            return NotImplemented
+        return self.a_dict() == otro.a_dict()
+    
+    # Registro mutable que se compara por valor: no es hashable a propósito
+    # (un hash por valor cambiaría al modificar sus campos)
+    __hash__ = None
+    
+    def a_dict(self):
+        """Retorna la factura con el formato de diccionario de obtener_factura"""
+        factura = {'id': self.id, 'fecha': self.fecha, 'cliente': self.cliente,
+                   'subtotal': self.subtotal, 'credito': self.credito, 'total': self.total,
+                   'created_at': self.created_at}
+        if self.items is not None:
+            factura['items'] = [item.a_dict() for item in self.items]
+        return factura
+
+
+def fila_a_linea_factura(cursor, row):
+    """row_factory de sqlite3 para filas (upc, producto, precio, qty, total) de detalle_factura"""
+    return LineaFactura(row[0], row[1], row[2], row[3], row[4])
+
+
+def fila_a_factura(cursor, row):
+    """row_factory de sqlite3 para filas (id, fecha, cliente, subtotal, credito, total, created_at)"""
+    return Factura(row[0], row[1], row[2], row[3], row[4], row[5], row[6])
+
+
+def validar_formato_factura(formato):
+    """Lanza ValueError si `formato` no está en FORMATOS_FACTURA"""
+    if formato not in FORMATOS_FACTURA:
+        raise ValueError(f"Formato de factura inválido: '{formato}'")
+
+
+class Carrito:
+    """
+    Líneas de la factura en captura, con el subtotal al día
+    
+    `lineas` es un diccionario UPC -> línea en orden de captura, así que
+    agregar, cambiar la cantidad o quitar un producto cuesta lo mismo con 10 o
+    con 10,000 líneas, y el subtotal se ajusta en cada cambio en vez de sumarse
+    de nuevo. Un UPC que ya está en el carrito suma su cantidad a la misma línea;
+    si llega con otro precio se rechaza con ValueError en vez de cobrar todas
+    las piezas a uno de los dos precios (para cambiarlo, quitar la línea y
+    volver a agregarla).
+    
+    Los métodos retornan una copia de la línea: cambiarla no toca el carrito.
+    
+    Cada línea lleva su precio y total en centavos y la cantidad en milésimas;
+    el subtotal se lleva en centavos enteros, así no acumula error de redondeo
+    por muchos cambios que tenga la factura.
+    """
+    
+    def __init__(self):
+        self.lineas = {}
+        self.subtotal_centavos = 0
+    
+    @property
+    def subtotal(self):
+        return self.subtotal_centavos / CENTAVOS_POR_PESO
+    
+    def __len__(self):
+        return len(self.lineas)
+    
+    def __iter__(self):
+        return iter(self.lineas.values())
+    
+    def __contains__(self, upc):
+        return upc in self.lineas
+    
+    def agregar(self, upc, producto, precio, qty):
+        """Agrega un producto o suma `qty` a su línea; retorna la línea"""
+        qty_milesimas = a_milesimas(qty)
+        if qty_milesimas <= 0:
+            raise ValueError('La cantidad debe ser mayor a 0')
+        precio_centavos = a_centavos(precio)
+        linea = self.lineas.get(upc)
+        if linea is not None and linea['precio_centavos'] != precio_centavos:
+            raise ValueError(
+                f"El UPC {upc} ya está en la factura a ${linea['precio']:.2f}; "
+                f"no se puede agregar a ${precio_centavos / CENTAVOS_POR_PESO:.2f}")
+        if linea is None:
+            linea = {'upc': upc, 'producto': producto,
+                     'precio': precio_centavos / CENTAVOS_POR_PESO, 'qty': 0, 'total': 0.0,
+                     'precio_centavos': precio_centavos, 'qty_milesimas': 0, 'total_centavos': 0}
+            self.lineas[upc] = linea
+        self._cambiar_cantidad(linea, linea['qty_milesimas'] + qty_milesimas)
+        return dict(linea)
+    
+    def obtener(self, upc):
+        """Retorna la línea del UPC o None"""
+        linea = self.lineas.get(upc)
+        return dict(linea) if linea is not None else None
+    
+    def actualizar_cantidad(self, upc, qty):
+        """Cambia la cantidad de una línea; retorna la línea o None si el UPC no está"""
+        qty_milesimas = a_milesimas(qty)
+        if qty_milesimas <= 0:
+            raise ValueError('La cantidad debe ser mayor a 0')
+        linea = self.lineas.get(upc)
+        if linea is None:
+            return None
+        self._cambiar_cantidad(linea, qty_milesimas)
+        return dict(linea)
+    
+    def quitar(self, upc):
+        """Quita la línea del UPC; retorna la línea quitada o None si no estaba"""
+        linea = self.lineas.pop(upc, None)
+        if linea is not None:
+            self.subtotal_centavos -= linea['total_centavos']
+        return linea
+    
+    def _cambiar_cantidad(self, linea, qty_milesimas):
+        """Fija la cantidad y el total de una línea y ajusta el subtotal"""
+        total_centavos = total_linea_centavos(linea['precio_centavos'], qty_milesimas)
+        self.subtotal_centavos += total_centavos - linea['total_centavos']
+        linea['qty_milesimas'] = qty_milesimas
+        linea['total_centavos'] = total_centavos
+        linea['qty'] = cantidad_de_milesimas(qty_milesimas)
+        linea['total'] = total_centavos / CENTAVOS_POR_PESO
+
 
 class FacturaManager:
-    """Clase para gestionar facturas"""
+    """
+    Clase para gestionar facturas
+    
+    Con descontar_inventario=True, guardar_factura y guardar_facturas restan
+    de `productos.qty` lo vendido en la misma transacción que guarda la
+    factura. Con permitir_negativo=False, una factura que dejaría algún
+    producto con existencia negativa se rechaza y no se guarda nada.
+    
+    Con concurrente=True (varias cajas sobre la misma base) la conexión usa
+    WAL, busy_timeout y BEGIN IMMEDIATE, y guardar una factura que encuentra
+    la base bloqueada se reintenta hasta `reintentos` veces.
+    """
     
-    def __init__(self, db_path='inventario.db'):
+    def __init__(self, db_path='inventario.db', descontar_inventario=False, permitir_negativo=True,
+                 concurrente=False, espera_bloqueo=ESPERA_BLOQUEO, reintentos=REINTENTOS_ESCRITURA):
         self.db_path = db_path
         self.conn = None
+        self.concurrente = concurrente
+        self.espera_bloqueo = espera_bloqueo
+        self.reintentos = reintentos
+        self.reintentos_por_bloqueo = 0
+        self.descontar_inventario = descontar_inventario
+        self.permitir_negativo = permitir_negativo
         self.inicializar_db()
-        self.factura_actual = []
-        self.credito = 0.0
+        self.factura_actual = Carrito()
+        self.credito_centavos = 0
+    
+    @property
+    def credito(self):
+        """Crédito de la factura actual en pesos"""
+        return self.credito_centavos / CENTAVOS_POR_PESO
     
     def inicializar_db(self):
         """Inicializa la base de datos SQLite para facturas"""
-        self.conn = sqlite3.connect(self.db_path)
+        self.conn = conectar_db(self.db_path, self.concurrente, self.espera_bloqueo)
         cursor = self.conn.cursor()
         
         # Crear tabla de facturas
@@ -43,7 +317,10 @@ class FacturaManager:
                 archivo_csv TEXT,
                 archivo_excel TEXT,
                 archivo_pdf TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                subtotal_centavos INTEGER NOT NULL DEFAULT 0,
+                credito_centavos INTEGER NOT NULL DEFAULT 0,
+                total_centavos INTEGER NOT NULL DEFAULT 0
             )
         ''')
         
@@ -57,44 +334,141 @@ class FacturaManager:
                 precio REAL NOT NULL,
                 qty REAL NOT NULL,
                 total REAL NOT NULL,
+                precio_centavos INTEGER NOT NULL DEFAULT 0,
+                qty_milesimas INTEGER NOT NULL DEFAULT 0,
+                total_centavos INTEGER NOT NULL DEFAULT 0,
                 FOREIGN KEY (factura_id) REFERENCES facturas(id)
             )
         ''')
         
+        # Las líneas de una factura se leen y se descuentan del inventario por factura_id
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_detalle_factura_factura
+            ON detalle_factura (factura_id)
+        ''')
+        
         self.conn.commit()
+        
+        if version_esquema(cursor, 'facturas') < VERSION_FACTURAS:
+            self._migrar_centavos()
+    
+    def _migrar_centavos(self):
+        """
+        Agrega las columnas en centavos/milésimas a una base de datos anterior
+        (las que falten en cada tabla) y las llena a partir de las columnas
+        REAL, que se dejan como estaban. Todo corre en una sola transacción
+        junto con la nueva versión, así que una migración interrumpida se
+        deshace completa y vuelve a correr al abrir la base. Las columnas
+        nuevas van al final para no mover las que se leen por posición.
+        """
+        cursor = self.conn.cursor()
+        try:
+            # ALTER TABLE no abre transacción por sí solo en el módulo sqlite3
+            cursor.execute('BEGIN IMMEDIATE')
+            # Otro proceso pudo migrar mientras se esperaba el bloqueo
+            if version_esquema(cursor, 'facturas') >= VERSION_FACTURAS:
+                self.conn.commit()
+                return
+            
+            for tabla, columnas_nuevas in COLUMNAS_CENTAVOS.items():
+                columnas = {fila[1] for fila in cursor.execute(f'PRAGMA table_info({tabla})')}
+                for columna in columnas_nuevas:
+                    if columna not in columnas:
+                        cursor.execute(f'ALTER TABLE {tabla} ADD COLUMN {columna} '
+                                       f'INTEGER NOT NULL DEFAULT 0')
+            
+            cursor.execute('''
+                UPDATE facturas SET
+                    subtotal_centavos = CAST(ROUND(subtotal * 100) AS INTEGER),
+                    credito_centavos = CAST(ROUND(COALESCE(credito, 0) * 100) AS INTEGER),
+                    total_centavos = CAST(ROUND(total * 100) AS INTEGER)
+            ''')
+            cursor.execute('''
+                UPDATE detalle_factura SET
+                    precio_centavos = CAST(ROUND(precio * 100) AS INTEGER),
+                    qty_milesimas = CAST(ROUND(qty * 1000) AS INTEGER),
+                    total_centavos = CAST(ROUND(total * 100) AS INTEGER)
+            ''')
+            guardar_version_esquema(cursor, 'facturas', VERSION_FACTURAS)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
     
     def nueva_factura(self):
         """Inicia una nueva factura vacía"""
-        self.factura_actual = []
-        self.credito = 0.0
+        self.factura_actual = Carrito()
+        self.credito_centavos = 0
     
     def agregar_item(self, upc, producto, precio, qty):
-        """Agrega un item a la factura actual"""
-        total_linea = precio * qty
-        
-        item = {
-            'upc': upc,
-            'producto': producto,
-            'precio': precio,
-            'qty': qty,
-            'total': total_linea
-        }
+        """
+        Agrega un item a la factura actual; si el UPC ya está, suma la cantidad
+        a su línea. Retorna la línea. Lanza ValueError si qty no es mayor a 0 o
+        si el UPC ya está en la factura con otro precio.
+        """
+        return self.factura_actual.agregar(upc, producto, precio, qty)
+    
+    def actualizar_item(self, upc, qty):
+        """Cambia la cantidad de un item de la factura actual (None si no está)"""
+        return self.factura_actual.actualizar_cantidad(upc, qty)
+    
+    def quitar_item(self, upc):
+        """Quita un item de la factura actual; retorna la línea quitada o None"""
+        return self.factura_actual.quitar(upc)
+    
+    def agregar_items_escaneados(self, archivo, inventario):
+        """
+        Agrega a la factura actual los productos de un archivo de escaneos (un
+        código de barras por línea, como lo descargan los lectores de mano).
+        Los escaneos repetidos del mismo producto se juntan en una línea con su
+        cantidad. `inventario` es el InventarioManager que resuelve los códigos.
+        Los productos que ya están en la factura con otro precio no se agregan
+        y se reportan en `rechazados`.
+        """
+        try:
+            with open(archivo, 'r', encoding='utf-8') as f:
+                productos = inventario.obtener_productos_por_upcs(f)
+        except OSError as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
         
-        self.factura_actual.append(item)
-        return item
+        items = []
+        no_encontrados = []
+        rechazados = []
+        for codigo, producto in productos.items():
+            if producto is None:
+                no_encontrados.append(codigo)
+                continue
+            try:
+                items.append(self.agregar_item(
+                    producto['upc'], producto['producto'], producto['precio'], producto['cantidad']))
+            except ValueError as e:
+                rechazados.append({'upc': producto['upc'], 'error': str(e)})
+        
+        return {
+            'success': True,
+            'items': items,
+            'no_encontrados': no_encontrados,
+            'rechazados': rechazados
+        }
     
     def aplicar_credito(self, credito):
         """Aplica un crédito a la factura"""
-        self.credito = abs(credito)
+        self.credito_centavos = abs(a_centavos(credito))
     
     def calcular_subtotal(self):
-        """Calcula el subtotal de la factura"""
-        return sum(item['total'] for item in self.factura_actual)
+        """Calcula el subtotal de la factura (el carrito lo lleva al día)"""
+        return self.factura_actual.subtotal
     
     def calcular_total(self):
         """Calcula el total final de la factura"""
-        subtotal = self.calcular_subtotal()
-        return max(0, subtotal - self.credito)
+        return self._total_centavos() / CENTAVOS_POR_PESO
+    
+    def _total_centavos(self):
+        """Total de la factura actual en centavos"""
+        return max(0, self.factura_actual.subtotal_centavos - self.credito_centavos)
     
     def guardar_factura(self, fecha=None, cliente='Cliente General'):
         """
@@ -110,35 +484,86 @@ class FacturaManager:
         if fecha is None:
             fecha = datetime.now().strftime('%Y-%m-%d')
         
-        subtotal = self.calcular_subtotal()
-        total = self.calcular_total()
+        subtotal_centavos = self.factura_actual.subtotal_centavos
+        total_centavos = self._total_centavos()
         
-        cursor = self.conn.cursor()
+        def escribir():
+            cursor = self.conn.cursor()
+            factura_id = self._insertar_factura(
+                cursor, fecha, cliente, subtotal_centavos, self.credito_centavos,
+                total_centavos, self.factura_actual)
+            if self.descontar_inventario:
+                self._descontar_inventario(cursor, factura_id, factura_id)
+            return factura_id
         
         try:
-            # Insertar factura
-            cursor.execute('''
-                INSERT INTO facturas (fecha, cliente, subtotal, credito, total)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (fecha, cliente, subtotal, self.credito, total))
+            factura_id = escribir_con_reintentos(self, escribir)
             
-            factura_id = cursor.lastrowid
+            return {
+                'success': True,
+                'factura_id': factura_id,
+                'subtotal': subtotal_centavos / CENTAVOS_POR_PESO,
+                'credito': self.credito,
+                'total': total_centavos / CENTAVOS_POR_PESO
+            }
             
-            # Insertar detalle de factura
-            for item in self.factura_actual:
-                cursor.execute('''
-                    INSERT INTO detalle_factura (factura_id, upc, producto, precio, qty, total)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (factura_id, item['upc'], item['producto'], item['precio'], item['qty'], item['total']))
+        except Exception as e:
+            self.conn.rollback()
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def guardar_facturas(self, facturas):
+        """
+        Guarda varias facturas en una sola transacción (ej: la captura de fin
+        de día). Cada factura es un diccionario con 'items' (diccionarios con
+        upc, producto, precio y qty, como los de agregar_item) y opcionalmente
+        'fecha', 'cliente' y 'credito'; también se aceptan registros Factura.
+        
+        Si alguna factura falla no se guarda ninguna. El resultado trae los
+        `facturas_ids` en el mismo orden de la lista.
+        """
+        inicio = time.perf_counter()
+        facturas = [factura.a_dict() if isinstance(factura, Factura) else factura
+                    for factura in facturas]
+        
+        for numero, factura in enumerate(facturas, 1):
+            if not factura.get('items'):
+                return {
+                    'success': False,
+                    'error': f'La factura {numero} está vacía'
+                }
+        
+        def escribir():
+            cursor = self.conn.cursor()
+            facturas_ids = []
+            for factura in facturas:
+                items = [linea_en_centavos(item) for item in factura['items']]
+                subtotal_centavos = sum(item['total_centavos'] for item in items)
+                credito_centavos = abs(a_centavos(factura.get('credito') or 0))
+                facturas_ids.append(self._insertar_factura(
+                    cursor,
+                    factura.get('fecha') or datetime.now().strftime('%Y-%m-%d'),
+                    factura.get('cliente') or 'Cliente General',
+                    subtotal_centavos, credito_centavos,
+                    max(0, subtotal_centavos - credito_centavos), items))
             
-            self.conn.commit()
+            if self.descontar_inventario:
+                self._descontar_inventario(cursor, facturas_ids[0], facturas_ids[-1])
+            return facturas_ids
+        
+        try:
+            facturas_ids = escribir_con_reintentos(self, escribir)
+            lineas = sum(len(factura['items']) for factura in facturas)
             
+            duracion = time.perf_counter() - inicio
             return {
                 'success': True,
-                'factura_id': factura_id,
-                'subtotal': subtotal,
-                'credito': self.credito,
-                'total': total
+                'facturas_ids': facturas_ids,
+                'lineas': lineas,
+                'duracion_segundos': duracion,
+                'facturas_por_segundo': len(facturas_ids) / duracion if duracion > 0 else 0.0
             }
             
         except Exception as e:
@@ -148,6 +573,86 @@ class FacturaManager:
                 'error': str(e)
             }
     
+    def _insertar_factura(self, cursor, fecha, cliente, subtotal_centavos, credito_centavos,
+                          total_centavos, items):
+        """
+        Inserta el encabezado de una factura y todas sus líneas (un solo
+        executemany) dentro de la transacción en curso; retorna el id asignado.
+        Los importes llegan en centavos y las líneas con sus campos en
+        centavos/milésimas; las columnas REAL se escriben a partir de ellos.
+        """
+        cursor.execute('''
+            INSERT INTO facturas (fecha, cliente, subtotal, credito, total,
+                                  subtotal_centavos, credito_centavos, total_centavos)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (fecha, cliente,
+              subtotal_centavos / CENTAVOS_POR_PESO, credito_centavos / CENTAVOS_POR_PESO,
+              total_centavos / CENTAVOS_POR_PESO,
+              subtotal_centavos, credito_centavos, total_centavos))
+        
+        factura_id = cursor.lastrowid
+        
+        cursor.executemany('''
+            INSERT INTO detalle_factura (factura_id, upc, producto, precio, qty, total,
+                                         precio_centavos, qty_milesimas, total_centavos)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(factura_id, item['upc'], item['producto'], item['precio'], item['qty'], item['total'],
+               item['precio_centavos'], item['qty_milesimas'], item['total_centavos'])
+              for item in items])
+        
+        return factura_id
+    
+    def _descontar_inventario(self, cursor, primer_id, ultimo_id):
+        """
+        Resta de productos.qty lo vendido en las facturas primer_id..ultimo_id
+        con un solo UPDATE ... FROM sobre sus líneas (en SQLite anterior a 3.35,
+        un UPDATE con subconsulta correlacionada y un SELECT de las existencias
+        que quedaron), dentro de la transacción en curso. La resta es relativa
+        (qty = qty - vendido), así que dos cajas que guardan a la vez no pisan
+        el descuento de la otra. Las líneas cuyo UPC no está en el catálogo no
+        descuentan nada.
+        
+        La huella de los productos descontados se borra: su qty ya no es la
+        del último CSV importado, así que una importación delta los reescribe.
+        
+        Lanza ValueError si permitir_negativo es False y algún producto queda
+        con existencia negativa; quien llama hace rollback.
+        """
+        if DESCUENTO_UPDATE_FROM:
+            cursor.execute('''
+                UPDATE productos
+                SET qty = (CAST(ROUND(COALESCE(productos.qty, 0) * 1000) AS INTEGER)
+                           - vendido.qty_milesimas) / 1000.0,
+                    huella = NULL
+                FROM (
+                    SELECT upc, SUM(qty_milesimas) AS qty_milesimas
+                    FROM detalle_factura
+                    WHERE factura_id BETWEEN ? AND ?
+                    GROUP BY upc
+                ) AS vendido
+                WHERE productos.upc = vendido.upc
+                RETURNING productos.upc, productos.qty
+            ''', (primer_id, ultimo_id))
+        else:
+            cursor.execute('''
+                UPDATE productos
+                SET qty = (CAST(ROUND(COALESCE(qty, 0) * 1000) AS INTEGER)
+                           - (SELECT SUM(qty_milesimas)
+                              FROM detalle_factura
+                              WHERE factura_id BETWEEN ? AND ?
+                                AND detalle_factura.upc = productos.upc)) / 1000.0,
+                    huella = NULL
+                WHERE upc IN (SELECT upc FROM detalle_factura WHERE factura_id BETWEEN ? AND ?)
+            ''', (primer_id, ultimo_id, primer_id, ultimo_id))
+            cursor.execute('''
+                SELECT upc, qty FROM productos
+                WHERE upc IN (SELECT upc FROM detalle_factura WHERE factura_id BETWEEN ? AND ?)
+            ''', (primer_id, ultimo_id))
+        
+        negativos = [upc for upc, qty in cursor.fetchall() if qty < 0]
+        if negativos and not self.permitir_negativo:
+            raise ValueError(f"Inventario insuficiente para: {', '.join(sorted(negativos))}")
+    
     def exportar_factura_csv(self, factura_id, directorio='facturas'):
         """Exporta la factura a formato CSV"""
         Path(directorio).mkdir(exist_ok=True)
@@ -378,8 +883,15 @@ class FacturaManager:
             'mensaje': f'Factura exportada a PDF: {nombre_archivo}'
         }
     
-    def obtener_factura(self, factura_id):
-        """Obtiene los detalles de una factura"""
+    def obtener_factura(self, factura_id, formato='dict'):
+        """
+        Obtiene los detalles de una factura; con formato='registro' retorna una
+        Factura con sus LineaFactura, armadas directo por el row_factory
+        """
+        validar_formato_factura(formato)
+        if formato == 'registro':
+            return self._obtener_factura_registro(factura_id)
+        
         cursor = self.conn.cursor()
         
         cursor.execute('SELECT * FROM facturas WHERE id = ?', (factura_id,))
@@ -415,9 +927,44 @@ class FacturaManager:
             ]
         }
     
-    def listar_facturas(self, limite=50):
-        """Lista las últimas facturas generadas"""
+    def _obtener_factura_registro(self, factura_id):
+        """obtener_factura con formato='registro'"""
         cursor = self.conn.cursor()
+        cursor.row_factory = fila_a_factura
+        cursor.execute('''
+            SELECT id, fecha, cliente, subtotal, credito, total, created_at
+            FROM facturas
+            WHERE id = ?
+        ''', (factura_id,))
+        factura = cursor.fetchone()
+        
+        if not factura:
+            return None
+        
+        cursor.row_factory = fila_a_linea_factura
+        cursor.execute('''
+            SELECT upc, producto, precio, qty, total
+            FROM detalle_factura
+            WHERE factura_id = ?
+        ''', (factura_id,))
+        factura.items = cursor.fetchall()
+        
+        return factura
+    
+    def listar_facturas(self, limite=50, formato='dict'):
+        """Lista las últimas facturas generadas; con formato='registro' como Factura sin items"""
+        validar_formato_factura(formato)
+        cursor = self.conn.cursor()
+        
+        if formato == 'registro':
+            cursor.row_factory = fila_a_factura
+            cursor.execute('''
+                SELECT id, fecha, cliente, subtotal, credito, total, created_at
+                FROM facturas
+                ORDER BY created_at DESC
+                LIMIT ?
+            ''', (limite,))
+            return cursor.fetchall()
         
         cursor.execute('''
             SELECT id, fecha, cliente, total, created_at
@@ -438,6 +985,32 @@ class FacturaManager:
         
         return facturas
     
+    def resumen_ventas(self, fecha_desde=None, fecha_hasta=None):
+        """
+        Suma las facturas entre dos fechas (YYYY-MM-DD, ambas incluidas; None
+        para no limitar). La suma se hace sobre las columnas en centavos, así
+        que el resultado es exacto con cualquier cantidad de facturas.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT COUNT(*),
+                   COALESCE(SUM(subtotal_centavos), 0),
+                   COALESCE(SUM(credito_centavos), 0),
+                   COALESCE(SUM(total_centavos), 0)
+            FROM facturas
+            WHERE (? IS NULL OR fecha >= ?) AND (? IS NULL OR fecha <= ?)
+        ''', (fecha_desde, fecha_desde, fecha_hasta, fecha_hasta))
+        
+        facturas, subtotal_centavos, credito_centavos, total_centavos = cursor.fetchone()
+        
+        return {
+            'facturas': facturas,
+            'subtotal': subtotal_centavos / CENTAVOS_POR_PESO,
+            'credito': credito_centavos / CENTAVOS_POR_PESO,
+            'total': total_centavos / CENTAVOS_POR_PESO,
+            'total_centavos': total_centavos
+        }
+    
     def cerrar(self):
         """Cierra la conexión a la base de datos"""
         if self.conn:
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Instantánea binaria de solo lectura del catálogo para terminales de consulta de precios
+El Mexiquense Market
+
+Uso:
+    python instantanea.py exportar inventario.db catalogo.inst
+    python instantanea.py consultar catalogo.inst 070038372806 [--prefijo]
+
+El archivo tiene secciones de ancho fijo que se leen directo del mmap, así
+que abrirlo no requiere leer ni convertir nada más que el encabezado:
+
+- encabezado (FORMATO_ENCABEZADO)
+- precios y cantidades: float64 por producto, en orden de UPC
+- UPC: arreglo ordenado de `ancho_upc` bytes por producto, rellenos con ceros
+- desplazamientos: uint32 por producto (+1) hacia el montón de nombres
+- nombres: montón de textos UTF-8 concatenados
+- GTIN: pares (GTIN-14, índice del producto) ordenados por GTIN
+- filtro de Bloom con los UPC y los GTIN del catálogo
+"""
+
+import argparse
+import hashlib
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+import time
+from pathlib import Path
+
+
+# Identificador y versión del formato
+FIRMA = b'MXQCAT\x00\x01'
+VERSION = 1
+
+# Firma, versión, productos, ancho_upc, productos con GTIN, funciones hash del
+# filtro de Bloom, bits del filtro y la posición de cada sección
+FORMATO_ENCABEZADO = '<8sIIIIIQ' + 'Q' * 7
+TAMANO_ENCABEZADO = struct.calcsize(FORMATO_ENCABEZADO)
+
+# Ancho de un GTIN-14 y de un par (GTIN, índice) en la sección de GTIN
+LONGITUD_GTIN = 14
+TAMANO_PAR_GTIN = LONGITUD_GTIN + 4
+
+# Bits por llave y funciones hash del filtro de Bloom (~1% de falsos positivos)
+BITS_POR_LLAVE_BLOOM = 10
+HASHES_BLOOM = 7
+
+# Resultados de buscar_por_prefijo cuando no se indica límite
+LIMITE_PREFIJO = 20
+
+
+def normalizar_gtin(codigo):
+    """
+    Normaliza un código a GTIN-14 con la misma regla que inventario.normalizar_gtin
+    (8, 11, 12, 13 o 14 dígitos completados con ceros y con dígito verificador
+    válido); None si no aplica. Se usa para el código escaneado y se repite
+    aquí para que las terminales no necesiten pandas ni el resto del sistema.
+    """
+    codigo = codigo.strip()
+    if not (codigo.isascii() and codigo.isdigit() and len(codigo) in (8, 11, 12, 13, 14)):
+        return None
+    gtin = codigo.zfill(LONGITUD_GTIN)
+    suma = sum(int(digito) * (3 if i % 2 == 0 else 1) for i, digito in enumerate(gtin[:-1]))
+    if (10 - suma % 10) % 10 != int(gtin[-1]):
+        return None
+    return gtin
+
+
+def posiciones_bloom(llave, bits, hashes=HASHES_BLOOM):
+    """Posiciones del filtro de Bloom de `llave` (bytes), por doble hash"""
+    resumen = hashlib.blake2b(llave, digest_size=16).digest()
+    h1 = int.from_bytes(resumen[:8], 'little')
+    h2 = int.from_bytes(resumen[8:], 'little') | 1
+    return [(h1 + i * h2) % bits for i in range(hashes)]
+
+
+def exportar_instantanea(db_path, ruta_salida):
+    """
+    Escribe la tabla productos de `db_path` en una instantánea binaria.
+    El archivo se escribe aparte y se reemplaza al final, así que una
+    terminal que tenga abierta la versión anterior la sigue leyendo completa.
+    """
+    inicio = time.perf_counter()
+    ruta_salida = Path(ruta_salida)
+    
+    try:
+        conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+        try:
+            # ORDER BY upc usa la comparación binaria de SQLite, la misma que
+            # la búsqueda binaria sobre los bytes del archivo. El GTIN-14 es el
+            # que guardó el inventario, así que la instantánea encuentra
+            # exactamente los mismos productos que obtener_producto_por_upc
+            filas = conn.execute('''
+                SELECT upc, producto, precio, qty, gtin
+                FROM productos
+                ORDER BY upc
+            ''').fetchall()
+        finally:
+            conn.close()
+        
+        upcs = [fila[0].encode('utf-8') for fila in filas]
+        nombres = [fila[1].encode('utf-8') for fila in filas]
+        total = len(filas)
+        ancho_upc = max((len(upc) for upc in upcs), default=1)
+        
+        desplazamientos = [0] * (total + 1)
+        for i, nombre in enumerate(nombres):
+            desplazamientos[i + 1] = desplazamientos[i] + len(nombre)
+        if desplazamientos[-1] >= 2 ** 32:
+            raise ValueError('Los nombres de productos exceden 4 GiB')
+        
+        gtins = sorted((fila[4].encode('ascii'), i) for i, fila in enumerate(filas) if fila[4])
+        
+        # Filtro de Bloom con los UPC y los GTIN
+        bits = max(64, (total + len(gtins)) * BITS_POR_LLAVE_BLOOM)
+        bloom = bytearray((bits + 7) // 8)
+        for llave in upcs + [gtin for gtin, _ in gtins]:
+            for posicion in posiciones_bloom(llave, bits):
+                bloom[posicion >> 3] |= 1 << (posicion & 7)
+        
+        secciones = [
+            struct.pack(f'<{total}d', *(fila[2] for fila in filas)),
+            struct.pack(f'<{total}d', *(fila[3] or 0.0 for fila in filas)),
+            b''.join(upc.ljust(ancho_upc, b'\0') for upc in upcs),
+            struct.pack(f'<{total + 1}I', *desplazamientos),
+            b''.join(nombres),
+            b''.join(gtin + struct.pack('<I', i) for gtin, i in gtins),
+            bytes(bloom),
+        ]
+        posiciones = []
+        posicion = TAMANO_ENCABEZADO
+        for seccion in secciones:
+            posiciones.append(posicion)
+            posicion += len(seccion)
+        
+        encabezado = struct.pack(FORMATO_ENCABEZADO, FIRMA, VERSION, total, ancho_upc,
+                                 len(gtins), HASHES_BLOOM, bits, *posiciones)
+        
+        temporal = ruta_salida.with_name(ruta_salida.name + '.tmp')
+        with open(temporal, 'wb') as archivo:
+            archivo.write(encabezado)
+            for seccion in secciones:
+                archivo.write(seccion)
+        os.replace(temporal, ruta_salida)
+        
+        return {
+            'success': True,
+            'mensaje': f'Se exportaron {total} productos a {ruta_salida}',
+            'productos': total,
+            'bytes': posicion,
+            'duracion_segundos': time.perf_counter() - inicio
+        }
+    
+    except Exception as e:
+        return {
+            'success': False,
+            'error': f'Error al exportar la instantánea: {str(e)}'
+        }
+
+
+class InstantaneaCatalogo:
+    """
+    Lector de una instantánea del catálogo mapeada en memoria (mmap)
+    
+    Abrir el archivo solo lee el encabezado; cada consulta es una búsqueda
+    binaria sobre el arreglo de UPC y lee del mmap únicamente las páginas que
+    toca. Los códigos que no están en el filtro de Bloom se descartan sin
+    buscar. Las búsquedas distinguen mayúsculas, como obtener_producto_por_upc.
+    """
+    
+    def __init__(self, ruta):
+        self.ruta = ruta
+        with open(ruta, 'rb') as archivo:
+            self.datos = mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        (firma, version, self.total, self.ancho_upc, self.total_gtin, self.hashes_bloom,
+         self.bits_bloom, self._precios, self._cantidades, self._upcs, self._desplazamientos,
+         self._nombres, self._gtins, self._bloom) = struct.unpack_from(FORMATO_ENCABEZADO, self.datos)
+        
+        if firma != FIRMA or version != VERSION:
+            self.datos.close()
+            raise ValueError(f'{ruta} no es una instantánea del catálogo (versión {VERSION})')
+    
+    def __len__(self):
+        return self.total
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *excepcion):
+        self.cerrar()
+    
+    def posiblemente_contiene(self, codigo):
+        """False si el código seguro no está en el catálogo (filtro de Bloom)"""
+        datos = self.datos
+        base = self._bloom
+        return all(datos[base + (posicion >> 3)] >> (posicion & 7) & 1
+                   for posicion in posiciones_bloom(codigo.encode('utf-8'), self.bits_bloom,
+                                                     self.hashes_bloom))
+    
+    def _upc(self, i):
+        """UPC de la posición i con su relleno de ceros"""
+        inicio = self._upcs + i * self.ancho_upc
+        return self.datos[inicio:inicio + self.ancho_upc]
+    
+    def _producto(self, i):
+        """Arma el diccionario del producto de la posición i"""
+        inicio, fin = struct.unpack_from('<2I', self.datos, self._desplazamientos + 4 * i)
+        return {
+            'upc': self._upc(i).rstrip(b'\0').decode('utf-8'),
+            'producto': self.datos[self._nombres + inicio:self._nombres + fin].decode('utf-8'),
+            'precio': struct.unpack_from('<d', self.datos, self._precios + 8 * i)[0],
+            'qty': struct.unpack_from('<d', self.datos, self._cantidades + 8 * i)[0]
+        }
+    
+    def _primera_posicion(self, llave):
+        """Primera posición cuyo UPC (con relleno) es >= llave"""
+        bajo, alto = 0, self.total
+        while bajo < alto:
+            medio = (bajo + alto) // 2
+            if self._upc(medio) < llave:
+                bajo = medio + 1
+            else:
+                alto = medio
+        return bajo
+    
+    def _buscar_gtin(self, gtin):
+        """Posición del producto con `gtin` (bytes) o None"""
+        datos = self.datos
+        bajo, alto = 0, self.total_gtin
+        while bajo < alto:
+            medio = (bajo + alto) // 2
+            inicio = self._gtins + medio * TAMANO_PAR_GTIN
+            if datos[inicio:inicio + LONGITUD_GTIN] < gtin:
+                bajo = medio + 1
+            else:
+                alto = medio
+        inicio = self._gtins + bajo * TAMANO_PAR_GTIN
+        if bajo < self.total_gtin and datos[inicio:inicio + LONGITUD_GTIN] == gtin:
+            return struct.unpack_from('<I', datos, inicio + LONGITUD_GTIN)[0]
+        return None
+    
+    def buscar(self, upc):
+        """
+        Busca un producto por UPC exacto o, si no existe tal cual, por su forma
+        normalizada a GTIN-14 (como InventarioManager.obtener_producto_por_upc)
+        """
+        upc = upc.strip()
+        llave = upc.encode('utf-8')
+        gtin = normalizar_gtin(upc)
+        
+        if llave and len(llave) <= self.ancho_upc and self.posiblemente_contiene(upc):
+            i = self._primera_posicion(llave.ljust(self.ancho_upc, b'\0'))
+            if i < self.total and self._upc(i).rstrip(b'\0') == llave:
+                return self._producto(i)
+        
+        if gtin and self.posiblemente_contiene(gtin):
+            i = self._buscar_gtin(gtin.encode('ascii'))
+            if i is not None:
+                return self._producto(i)
+        
+        return None
+    
+    def buscar_por_prefijo(self, prefijo, limite=LIMITE_PREFIJO):
+        """Productos cuyo UPC empieza con `prefijo`, en orden de UPC (máximo `limite`)"""
+        llave = prefijo.strip().encode('utf-8')
+        if not llave or len(llave) > self.ancho_upc:
+            return []
+        
+        productos = []
+        i = self._primera_posicion(llave)
+        while i < self.total and len(productos) < limite and self._upc(i).startswith(llave):
+            productos.append(self._producto(i))
+            i += 1
+        return productos
+    
+    def cerrar(self):
+        """Libera el mapa del archivo"""
+        self.datos.close()
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='Instantánea binaria del catálogo')
+    subcomandos = parser.add_subparsers(dest='comando', required=True)
+    
+    exportar = subcomandos.add_parser('exportar', help='Exporta productos a una instantánea')
+    exportar.add_argument('db')
+    exportar.add_argument('salida')
+    
+    consultar = subcomandos.add_parser('consultar', help='Consulta un UPC en una instantánea')
+    consultar.add_argument('instantanea')
+    consultar.add_argument('upc')
+    consultar.add_argument('--prefijo', action='store_true')
+    
+    args = parser.parse_args()
+    
+    if args.comando == 'exportar':
+        resultado = exportar_instantanea(args.db, args.salida)
+        if not resultado['success']:
+            print(f"❌ {resultado['error']}")
+            return 1
+        print(f"✅ {resultado['mensaje']} ({resultado['bytes'] / 2**20:,.1f} MiB, "
+              f"{resultado['duracion_segundos']:.2f} s)")
+        return 0
+    
+    with InstantaneaCatalogo(args.instantanea) as catalogo:
+        productos = (catalogo.buscar_por_prefijo(args.upc) if args.prefijo
+                     else [producto for producto in [catalogo.buscar(args.upc)] if producto])
+    
+    if not productos:
+        print(f"❌ '{args.upc}' no está en el catálogo")
+        return 1
+    for producto in productos:
+        print(f"{producto['upc']:<20} {producto['producto'][:40]:<40} ${producto['precio']:>9.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,24 +5,996 @@ Sistema de Gestión de Inventario y Facturación
 El Mexiquense Market
 """
 
+import gc
+import glob
+import hashlib
+import importlib.util
+import os
+import random
+import re
+import numpy as np
 import pandas as pd
 import sqlite3
-import re
+import sys
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing, contextmanager, nullcontext
 from datetime import datetime
 from pathlib import Path
+from openpyxl import load_workbook
+
+
+COLUMNAS_REQUERIDAS = ['UPC', 'QTY', 'PRODUCT', 'PRICE']
+
+# Filas por executemany al escribir productos importados
+TAMANO_LOTE = 5000
+
+# Filas leídas del archivo por bloque en la importación por bloques
+FILAS_POR_BLOQUE = 50000
+
+# Fases cuya duración se reporta en estadisticas['tiempos'] de cada importación
+FASES_IMPORTACION = ('lectura', 'validacion', 'limpieza', 'escritura')
+
+# Tipos fijos para las columnas importadas. El UPC se lee como texto para
+# conservar los ceros a la izquierda (070038372806); precio y cantidad también,
+# para convertirlos después sin que un valor inválido aborte la lectura.
+TIPOS_COLUMNAS = {
+    'UPC': str,
+    'PRODUCT': str,
+    'PRICE': str,
+    'QTY': str
+}
+
+# Motor de lectura de CSV: pyarrow si está instalado, si no el motor C de pandas
+MOTOR_CSV = 'pyarrow' if importlib.util.find_spec('pyarrow') else 'c'
+
+# Índice FTS5 de trigramas para buscar UPC parciales (SQLite 3.34 o posterior)
+FTS_TRIGRAMA = sqlite3.sqlite_version_info >= (3, 34, 0)
+
+# Índice FTS5 de nombres de producto sin acentos (remove_diacritics 2, SQLite 3.27 o posterior)
+FTS_NOMBRES = sqlite3.sqlite_version_info >= (3, 27, 0)
+
+# Resultados por defecto de buscar_por_nombre
+LIMITE_BUSQUEDA_NOMBRE = 20
+
+# Modos de buscar_por_upc_parcial
+MODOS_BUSQUEDA_UPC = ('contiene', 'prefijo')
+
+# Mayor carácter Unicode: x + FIN_PREFIJO es cota superior de todo texto que empieza con x
+FIN_PREFIJO = '\U0010ffff'
+
+# Extensiones reconocidas al importar todos los archivos de una carpeta
+EXTENSIONES_IMPORTACION = ('.csv', '.xlsx', '.xls')
+
+# Carpeta donde se escriben las filas rechazadas por la validación
+DIRECTORIO_CUARENTENA = 'cuarentena'
+
+# Longitudes de códigos GTIN con dígito verificador (EAN-8, UPC-A, EAN-13, GTIN-14)
+LONGITUDES_GTIN = (8, 12, 13, 14)
+
+# Pesos del dígito verificador para un GTIN de 14 dígitos (sin el verificador)
+PESOS_GTIN = np.array([3, 1] * 6 + [3])
+
+# Longitudes de códigos numéricos que se normalizan a GTIN-14 (si su dígito
+# verificador cuadra): las de LONGITUDES_GTIN más el UPC-A sin su 0 inicial (11)
+LONGITUDES_NORMALIZABLES_GTIN = (8, 11, 12, 13, 14)
+LONGITUD_GTIN = 14
+
+# Versión de normalizar_gtin en SQL (misma regla) para la columna {columna};
+# la usa _migrar_gtin. Los dígitos en texto se suman como números.
+_RELLENO_GTIN = f"substr('{'0' * LONGITUD_GTIN}' || {{columna}}, -{LONGITUD_GTIN})"
+SQL_GTIN_COLUMNA = f'''
+    CASE WHEN {{columna}} NOT GLOB '*[^0-9]*'
+              AND length({{columna}}) IN ({', '.join(map(str, LONGITUDES_NORMALIZABLES_GTIN))})
+              AND (10 - ({' + '.join(f'{peso} * substr({_RELLENO_GTIN}, {i}, 1)'
+                                     for i, peso in enumerate(PESOS_GTIN.tolist(), 1))}) % 10) % 10
+                  = CAST(substr({_RELLENO_GTIN}, {LONGITUD_GTIN}, 1) AS INTEGER)
+         THEN {_RELLENO_GTIN}
+    END
+'''
+SQL_GTIN = SQL_GTIN_COLUMNA.format(columna='upc')
+
+# Varios ON CONFLICT en un mismo INSERT requieren SQLite 3.35
+CONFLICTO_GTIN = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+# Motivos de rechazo de la validación
+MOTIVO_PRECIO_VACIO = 'precio vacío'
+MOTIVO_PRECIO_INVALIDO = 'precio no numérico'
+MOTIVO_CANTIDAD_INVALIDA = 'cantidad no numérica'
+MOTIVO_CANTIDAD_NEGATIVA = 'cantidad negativa'
+MOTIVO_PRODUCTO_VACIO = 'producto sin nombre'
+MOTIVO_DIGITO_VERIFICADOR = 'dígito verificador de UPC inválido'
+
+# Versión de los datos de productos (ver version_esquema); al abrir una base
+# con una versión menor se corre _migrar_gtin
+VERSION_PRODUCTOS = 2
+
+# PRAGMA user_version es un solo entero para toda la base: cada grupo de
+# tablas guarda su versión en su propio par de dígitos (productos en las
+# unidades, facturas en las centenas). Una base con user_version = 2 es
+# productos v2 sin migraciones de facturas.
+POSICION_VERSION = {'productos': 1, 'facturas': 100}
+
+# Máximo de parámetros por consulta IN (...) al resolver listas de UPC
+TAMANO_LOTE_IN = 500
+
+# Longitud del prefijo de los UPC sintéticos (ej: CILANTRO001)
+LONGITUD_PREFIJO_SINTETICO = 10
+
+# Prefijo de los UPC sintéticos de productos cuyo nombre no tiene letras A-Z
+# (ej: '999' -> SIN001); sin él, el código sería solo dígitos y podría parecer
+# (o continuar) un código de barras real
+PREFIJO_SINTETICO_SIN_LETRAS = 'SIN'
+
+# Formatos en que los iteradores de productos entregan cada fila
+FORMATOS_PRODUCTO = ('dict', 'tupla', 'registro')
+
+# Filas que se traen de SQLite por cada fetchmany() al iterar productos
+FILAS_POR_LECTURA = 1000
+
+# Entradas del caché de búsquedas de InventarioManager (0 lo desactiva)
+TAMANO_CACHE_BUSQUEDAS = 256
+
+# Filas agregadas al índice de UPC en memoria que se revisan una por una;
+# al pasar de este número se reconstruyen sus arreglos (ver IndiceUPC.agregar)
+MAX_PENDIENTES_INDICE_UPC = 50000
+
+# Fracción máxima del catálogo que puede eliminar una importación con reemplazo
+MAX_FRACCION_ELIMINADA = 0.5
+
+# Modo concurrente (varias cajas sobre la misma base): segundos que una
+# conexión espera un bloqueo (busy_timeout) antes de fallar, y reintentos de
+# una escritura que aun así encontró la base bloqueada, con espera aleatoria
+# entre 0 y ESPERA_BASE_REINTENTO * 2^intento (máximo ESPERA_MAX_REINTENTO)
+ESPERA_BLOQUEO = 5.0
+REINTENTOS_ESCRITURA = 5
+ESPERA_BASE_REINTENTO = 0.05
+ESPERA_MAX_REINTENTO = 1.0
+
+# Fusión de la tabla temporal de importación con productos. El WHERE true evita
+# que SQLite interprete ON CONFLICT como parte del SELECT; ORDER BY rowid
+# respeta el orden del archivo cuando un UPC viene repetido.
+# Un UPC que ya existe con otra forma (ej: sin su 0 inicial) tiene el mismo GTIN
+# con dígito verificador válido, es decir, es el mismo artículo: cae en el
+# segundo ON CONFLICT y actualiza el producto existente (nombre, precio y
+# cantidad) sin cambiarle el UPC.
+SQL_FUSIONAR_STAGING = f'''
+    INSERT INTO productos (upc, producto, precio, qty, huella, gtin)
+    SELECT upc, producto, precio, qty, huella, gtin
+    FROM temp.productos_staging
+    WHERE true
+    ORDER BY rowid
+    ON CONFLICT(upc) DO UPDATE SET
+        precio = excluded.precio,
+        qty = excluded.qty,
+        huella = excluded.huella
+    {{condicion}}
+'''
+if CONFLICTO_GTIN:
+    SQL_FUSIONAR_STAGING += '''
+    ON CONFLICT(gtin) DO UPDATE SET
+        producto = excluded.producto,
+        precio = excluded.precio,
+        qty = excluded.qty,
+        huella = excluded.huella
+    {condicion}
+    '''
+
+# En modo delta la fusión no toca las filas cuya huella no cambió
+SQL_FUSIONAR_STAGING_DELTA = SQL_FUSIONAR_STAGING.format(
+    condicion='WHERE productos.huella IS NOT excluded.huella')
+SQL_FUSIONAR_STAGING = SQL_FUSIONAR_STAGING.format(condicion='')
+
+# Productos que no vienen en productos_staging ni por su UPC ni por su GTIN
+# (un reemplazo del catálogo los elimina)
+SQL_FUERA_DE_STAGING = '''
+    upc NOT IN (SELECT upc FROM temp.productos_staging)
+    AND (gtin IS NULL
+         OR gtin NOT IN (SELECT gtin FROM temp.productos_staging WHERE gtin IS NOT NULL))
+'''
+
+
+def verificar_columnas(df):
+    """Verifica que el DataFrame tenga las columnas requeridas"""
+    for col in COLUMNAS_REQUERIDAS:
+        if col not in df.columns:
+            raise ValueError(f"Columna '{col}' no encontrada en el CSV")
+
+
+def _a_texto(serie):
+    """Convierte una columna a texto igual que str() (NaN -> 'nan')"""
+    return serie.astype(str).fillna('nan')
+
+
+def precio_a_centavos(serie, errores='raise'):
+    """
+    Convierte una columna de precios ('$1,234.50', '1.9', 3.55) a centavos enteros
+    Los valores vacíos quedan como NA; más de dos decimales se redondean.
+    Si algún precio no es numérico lanza ValueError, o con errores='coerce'
+    lo deja como NA.
+    """
+    if pd.api.types.is_numeric_dtype(serie):
+        numeros = serie.astype(float)
+        vacio = serie.isna()
+    else:
+        texto = (_a_texto(serie)
+                 .str.replace('$', '', regex=False)
+                 .str.replace(',', '', regex=False)
+                 .str.strip())
+        vacio = serie.isna() | (texto == 'nan')
+        numeros = pd.to_numeric(texto.where(texto != '', '0').mask(vacio), errors='coerce')
+    
+    invalido = ~vacio & (numeros.isna() | numeros.abs().eq(float('inf')))
+    if invalido.any():
+        if errores != 'coerce':
+            raise ValueError(f"Precio inválido: '{serie[invalido].iloc[0]}'")
+        numeros = numeros.mask(invalido)
+    
+    return (numeros * 100).round().astype('Int64')
+
+
+def leer_csv(origen, motor=None):
+    """
+    Lee un CSV de productos con tipos explícitos (ver TIPOS_COLUMNAS)
+    Agrega la columna PRECIO_CENTAVOS con el precio ya convertido a centavos.
+    """
+    if (motor or MOTOR_CSV) == 'pyarrow':
+        df = _leer_csv_pyarrow(origen)
+    else:
+        df = pd.read_csv(origen, encoding='utf-8', dtype=TIPOS_COLUMNAS, engine='c')
+    return _agregar_centavos(df)
+
+
+def _leer_csv_pyarrow(origen):
+    """
+    Lee el CSV con pyarrow.csv indicando los tipos al lector, ya que
+    pd.read_csv(engine='pyarrow') los aplica después de inferirlos y
+    el UPC perdería los ceros a la izquierda
+    """
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+    
+    tipos = {
+        'UPC': pa.string(),
+        'PRODUCT': pa.string(),
+        'PRICE': pa.string(),
+        'QTY': pa.string()
+    }
+    opciones = pa_csv.ConvertOptions(column_types=tipos, strings_can_be_null=True)
+    return pa_csv.read_csv(origen, convert_options=opciones).to_pandas()
+
+
+def leer_csv_por_bloques(origen, filas_por_bloque=FILAS_POR_BLOQUE, filas_omitidas=0):
+    """
+    Igual que leer_csv pero genera DataFrames de `filas_por_bloque` filas
+    Usa el motor C de pandas, el único que permite leer por bloques.
+    `filas_omitidas` salta las primeras filas de datos (para reanudar).
+    """
+    omitir = range(1, filas_omitidas + 1) if filas_omitidas else None
+    with pd.read_csv(origen, encoding='utf-8', dtype=TIPOS_COLUMNAS, engine='c',
+                     chunksize=filas_por_bloque, skiprows=omitir) as lector:
+        for df in lector:
+            yield _agregar_centavos(df)
+
+
+def _agregar_centavos(df):
+    """
+    Agrega PRECIO_CENTAVOS si el DataFrame tiene columna PRICE
+    Los precios no numéricos quedan como NA (ver validar_productos)
+    """
+    if 'PRICE' in df.columns:
+        df['PRECIO_CENTAVOS'] = precio_a_centavos(df['PRICE'], errores='coerce')
+    return df
+
+
+def calcular_digito_verificador(digitos):
+    """Calcula el dígito verificador GTIN (UPC-A, EAN-13...) de un código sin él"""
+    suma = sum(int(digito) * (3 if i % 2 == 0 else 1)
+               for i, digito in enumerate(reversed(digitos)))
+    return str((10 - suma % 10) % 10)
+
+
+def expandir_upce(codigo):
+    """
+    Expande un UPC-E de 8 dígitos (sistema 0 o 1) a su UPC-A de 12 dígitos.
+    Retorna None si el código no puede ser un UPC-E.
+    """
+    if len(codigo) != 8 or not codigo.isdigit() or codigo[0] not in '01':
+        return None
+    sistema, d, verificador = codigo[0], codigo[1:7], codigo[7]
+    if d[5] in '012':
+        cuerpo = d[0:2] + d[5] + '0000' + d[2:5]
+    elif d[5] == '3':
+        cuerpo = d[0:3] + '00000' + d[3:5]
+    elif d[5] == '4':
+        cuerpo = d[0:4] + '00000' + d[4]
+    else:
+        cuerpo = d[0:5] + '0000' + d[5]
+    return sistema + cuerpo + verificador
+
+
+def upce_valido(codigo):
+    """Indica si un código de 8 dígitos es un UPC-E con dígito verificador válido"""
+    upca = expandir_upce(codigo)
+    return upca is not None and calcular_digito_verificador(upca[:-1]) == upca[-1]
+
+
+def normalizar_gtin(codigo):
+    """
+    Normaliza un código de barras a GTIN-14 completando con ceros a la izquierda,
+    así UPC-A, EAN-13 con 0 inicial y UPC sin su 0 inicial dan el mismo código.
+    Solo aplica a códigos de 8, 11, 12, 13 o 14 dígitos con dígito verificador
+    válido; retorna None para los demás (PLU, códigos internos).
+    """
+    if codigo is None:
+        return None
+    codigo = str(codigo).strip()
+    if not (codigo.isascii() and codigo.isdigit()
+            and len(codigo) in LONGITUDES_NORMALIZABLES_GTIN):
+        return None
+    gtin = codigo.zfill(LONGITUD_GTIN)
+    if calcular_digito_verificador(gtin[:-1]) != gtin[-1]:
+        return None
+    return gtin
+
+
+def normalizar_gtins(upcs):
+    """
+    Versión vectorizada de normalizar_gtin para una Serie de UPC: retorna
+    una Serie con el GTIN-14 o None donde no aplica
+    """
+    upcs = upcs.astype(object)
+    candidatos = (upcs.str.fullmatch(r'[0-9]+').fillna(False).astype(bool)
+                  & upcs.str.len().isin(LONGITUDES_NORMALIZABLES_GTIN))
+    gtins = pd.Series(None, index=upcs.index, dtype=object)
+    
+    if candidatos.any():
+        codigos = upcs[candidatos].str.zfill(LONGITUD_GTIN)
+        digitos = np.frombuffer(''.join(codigos).encode('ascii'), dtype=np.uint8)
+        digitos = digitos.reshape(-1, LONGITUD_GTIN).astype(np.int64) - ord('0')
+        verificador = (10 - (digitos[:, :13] @ PESOS_GTIN) % 10) % 10
+        validos = verificador == digitos[:, 13]
+        gtins[codigos.index[validos]] = codigos[validos].to_numpy()
+    
+    return gtins
+
+
+def digito_verificador_invalido(upcs):
+    """
+    Marca los UPC numéricos de 8, 12, 13 o 14 dígitos cuyo dígito verificador
+    no cuadra. Un código de 8 dígitos puede ser EAN-8 o UPC-E (cuyo verificador
+    se calcula sobre el UPC-A expandido): solo se marca si no es válido como
+    ninguno de los dos. Los demás códigos (PLU, internos, sin UPC) no se revisan.
+    """
+    candidatos = (upcs.str.fullmatch(r'[0-9]+').fillna(False).astype(bool)
+                  & upcs.str.len().isin(LONGITUDES_GTIN))
+    invalido = pd.Series(False, index=upcs.index)
+    
+    if candidatos.any():
+        codigos = upcs[candidatos].str.zfill(14).to_numpy(dtype=object)
+        digitos = np.frombuffer(''.join(codigos).encode('ascii'), dtype=np.uint8)
+        digitos = digitos.reshape(-1, 14).astype(np.int64) - ord('0')
+        verificador = (10 - (digitos[:, :13] @ PESOS_GTIN) % 10) % 10
+        invalido[candidatos] = verificador != digitos[:, 13]
+        
+        ocho_digitos = invalido & (upcs.str.len() == 8)
+        if ocho_digitos.any():
+            invalido[ocho_digitos] = ~upcs[ocho_digitos].map(upce_valido).astype(bool)
+    
+    return invalido
+
+
+def validar_productos(df):
+    """
+    Valida un DataFrame con columnas UPC, QTY, PRODUCT, PRICE en una sola pasada
+    vectorizada. Retorna (validos, rechazados); `rechazados` conserva las
+    columnas originales y agrega MOTIVO con las razones separadas por '; '.
+    """
+    if 'PRECIO_CENTAVOS' in df.columns:
+        centavos = df['PRECIO_CENTAVOS']
+    else:
+        centavos = precio_a_centavos(df['PRICE'], errores='coerce')
+    qty = pd.to_numeric(df['QTY'], errors='coerce')
+    upc = _a_texto(df['UPC']).str.strip()
+    nombre = df['PRODUCT'].astype(str).str.strip()
+    
+    precio_vacio = df['PRICE'].isna()
+    errores = {
+        MOTIVO_PRECIO_VACIO: precio_vacio,
+        MOTIVO_PRECIO_INVALIDO: ~precio_vacio & centavos.isna(),
+        MOTIVO_CANTIDAD_INVALIDA: df['QTY'].notna() & qty.isna(),
+        MOTIVO_CANTIDAD_NEGATIVA: qty < 0,
+        MOTIVO_PRODUCTO_VACIO: df['PRODUCT'].isna() | (nombre == ''),
+        MOTIVO_DIGITO_VERIFICADOR: digito_verificador_invalido(upc),
+    }
+    
+    motivos = pd.Series('', index=df.index, dtype=object)
+    for motivo, mascara in errores.items():
+        mascara = mascara.fillna(False).to_numpy(dtype=bool)
+        motivos[mascara] = motivos[mascara] + '; ' + motivo
+    
+    rechazado = (motivos != '').to_numpy()
+    rechazados = df[rechazado].drop(columns=['PRECIO_CENTAVOS'], errors='ignore')
+    rechazados = rechazados.assign(MOTIVO=motivos[rechazado].str.slice(2))
+    
+    return df[~rechazado], rechazados
+
+
+def ruta_cuarentena(archivo):
+    """Ruta del CSV de cuarentena para las filas rechazadas de `archivo`"""
+    nombre = 'stdin' if archivo == '-' else Path(str(archivo)).stem
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return Path(DIRECTORIO_CUARENTENA) / f'{nombre}_cuarentena_{timestamp}.csv'
+
+
+def normalizar_nombres(nombres):
+    """
+    Normaliza nombres de producto para el registro de UPC sintéticos:
+    mayúsculas, sin acentos y con espacios simples ('Jalapeño  ' -> 'JALAPENO')
+    """
+    return (nombres.astype(str)
+            .str.normalize('NFKD')
+            .str.replace('[\u0300-\u036f]', '', regex=True)
+            .str.upper()
+            .str.replace(r'\s+', ' ', regex=True)
+            .str.strip())
+
+
+def prefijo_upc_sintetico(producto):
+    """
+    Prefijo del UPC sintético de un producto: sus primeras letras A-Z en
+    mayúsculas, o PREFIJO_SINTETICO_SIN_LETRAS si no tiene ninguna
+    """
+    prefijo = re.sub(r'[^A-Z]', '', producto.upper())[:LONGITUD_PREFIJO_SINTETICO]
+    return prefijo or PREFIJO_SINTETICO_SIN_LETRAS
+
+
+def limpiar_productos(df):
+    """
+    Limpia un DataFrame con columnas UPC, QTY, PRODUCT, PRICE usando
+    operaciones vectorizadas. Retorna un DataFrame con columnas
+    upc, producto, precio, qty, huella listo para escribir.
+    
+    Los productos sin UPC quedan con upc None; al escribirlos se les asigna
+    su UPC sintético del registro (ver InventarioManager._asignar_upcs_sinteticos).
+    """
+    upc = _a_texto(df['UPC']).str.strip()
+    producto = _a_texto(df['PRODUCT']).str.strip()
+    qty = pd.to_numeric(df['QTY'], errors='coerce').fillna(0).astype(float)
+    
+    # Precio en centavos: ya convertido por leer_csv o se convierte aquí
+    if 'PRECIO_CENTAVOS' in df.columns:
+        centavos = df['PRECIO_CENTAVOS']
+    else:
+        centavos = precio_a_centavos(df['PRICE'], errores='coerce')
+    precio = centavos.astype(float) / 100
+    
+    sin_upc = (df['UPC'].isna() | (upc == 'nan') | (upc == '')).to_numpy()
+    upc = upc.to_numpy(dtype=object)
+    upc[sin_upc] = None
+    
+    productos = pd.DataFrame({
+        'upc': upc,
+        'producto': producto.to_numpy(dtype=object),
+        'precio': precio.to_numpy(),
+        'qty': qty.to_numpy()
+    })
+    productos['huella'] = calcular_huellas(productos)
+    return productos
+
+
+def calcular_huellas(productos):
+    """
+    Calcula la huella (hash de 64 bits) de cada fila de upc, producto, precio, qty
+    Se guarda en productos.huella para detectar filas sin cambios entre importaciones
+    """
+    huellas = pd.util.hash_pandas_object(productos[['upc', 'producto', 'precio', 'qty']], index=False)
+    # SQLite guarda enteros con signo de 64 bits
+    return huellas.to_numpy().view('int64')
+
+
+def _celda_a_texto(valor):
+    """
+    Convierte una celda de Excel a texto igual que read_excel con dtype=str:
+    un número entero guardado como decimal pierde el '.0' (70038372806.0 -> '70038372806')
+    """
+    if valor is None:
+        return None
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor)
+
+
+def leer_excel_por_bloques(archivo_excel, sheet_name='Sheet 1', filas_por_bloque=FILAS_POR_BLOQUE):
+    """
+    Lee un libro de Excel con openpyxl en modo de solo lectura
+    Genera tuplas (nombre_hoja, DataFrame) de a lo más `filas_por_bloque` filas;
+    la primera fila de cada hoja se usa como encabezado.
+    Con sheet_name=None se recorren todas las hojas.
+    Las columnas de TIPOS_COLUMNAS se convierten a texto como en la lectura
+    sin streaming, para que un bloque con celdas vacías no vuelva decimal el UPC.
+    """
+    libro = load_workbook(archivo_excel, read_only=True, data_only=True)
+    
+    try:
+        if sheet_name is None:
+            hojas = libro.worksheets
+        elif isinstance(sheet_name, int):
+            hojas = [libro.worksheets[sheet_name]]
+        else:
+            hojas = [libro[sheet_name]]
+        
+        for hoja in hojas:
+            filas = hoja.iter_rows(values_only=True)
+            encabezados = next(filas, None)
+            if encabezados is None:
+                continue
+            encabezados = ['' if valor is None else str(valor) for valor in encabezados]
+            columnas_texto = [i for i, encabezado in enumerate(encabezados)
+                              if encabezado in TIPOS_COLUMNAS]
+            
+            bloque = []
+            for fila in filas:
+                # Ignorar filas vacías, igual que pandas
+                if all(valor is None for valor in fila):
+                    continue
+                fila = list(fila)
+                for i in columnas_texto:
+                    if i < len(fila):
+                        fila[i] = _celda_a_texto(fila[i])
+                bloque.append(fila)
+                
+                if len(bloque) >= filas_por_bloque:
+                    yield hoja.title, pd.DataFrame(bloque, columns=encabezados)
+                    bloque = []
+            
+            if bloque:
+                yield hoja.title, pd.DataFrame(bloque, columns=encabezados)
+    finally:
+        libro.close()
+
+
+@contextmanager
+def medir_fase(estadisticas, fase):
+    """Suma a estadisticas['tiempos'][fase] los segundos que tarda el bloque with"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        tiempos = estadisticas['tiempos']
+        tiempos[fase] = tiempos.get(fase, 0.0) + time.perf_counter() - inicio
+
+
+def huella_archivo(archivo, tamano_bloque=1 << 20):
+    """Hash SHA-256 del contenido de un archivo, para reconocerlo al reanudar una importación"""
+    hash_archivo = hashlib.sha256()
+    with open(archivo, 'rb') as f:
+        for bloque in iter(lambda: f.read(tamano_bloque), b''):
+            hash_archivo.update(bloque)
+    return hash_archivo.hexdigest()
+
+
+def leer_y_limpiar_archivo(archivo, motor=None, sheet_name='Sheet 1', validar=True):
+    """
+    Lee, valida y limpia un archivo CSV o Excel completo, sin tocar la base de datos
+    Pensada para ejecutarse en un proceso aparte (ver importar_archivos): retorna
+    (DataFrame limpio, rechazados, None, tiempos) o (None, None, error, tiempos),
+    con `tiempos` la duración de las fases lectura, validacion y limpieza.
+    """
+    medicion = {'tiempos': {}}
+    
+    try:
+        with medir_fase(medicion, 'lectura'):
+            if Path(archivo).suffix.lower() == '.csv':
+                df = leer_csv(archivo, motor)
+            else:
+                df = pd.read_excel(archivo, sheet_name=sheet_name, dtype=TIPOS_COLUMNAS)
+        
+        verificar_columnas(df)
+        rechazados = None
+        if validar:
+            with medir_fase(medicion, 'validacion'):
+                df, rechazados = validar_productos(df)
+        with medir_fase(medicion, 'limpieza'):
+            productos = limpiar_productos(df)
+        return productos, rechazados, None, medicion['tiempos']
+        
+    except Exception as e:
+        return None, None, str(e), medicion['tiempos']
+
+
+def buscar_archivos_importacion(ruta):
+    """
+    Retorna la lista ordenada de archivos a importar: todos los CSV/Excel
+    de `ruta` si es una carpeta, o los que coincidan si es un patrón glob
+    """
+    if os.path.isdir(ruta):
+        archivos = [str(archivo) for archivo in Path(ruta).iterdir()
+                    if archivo.suffix.lower() in EXTENSIONES_IMPORTACION]
+    else:
+        archivos = glob.glob(ruta)
+    
+    return sorted(archivos)
+
+
+def conectar_db(db_path, concurrente=False, espera_bloqueo=ESPERA_BLOQUEO):
+    """
+    Abre la conexión a SQLite. En modo concurrente la base usa WAL (los
+    lectores no bloquean al que escribe ni al revés), cada conexión espera
+    hasta `espera_bloqueo` segundos por un bloqueo (busy_timeout) y las
+    transacciones abren con BEGIN IMMEDIATE: toman el bloqueo de escritura al
+    empezar, así que dos escrituras nunca se bloquean a la mitad.
+    """
+    if not concurrente:
+        return sqlite3.connect(db_path)
+    
+    conn = sqlite3.connect(db_path, timeout=espera_bloqueo, isolation_level='IMMEDIATE')
+    conn.execute(f'PRAGMA busy_timeout = {int(espera_bloqueo * 1000)}')
+    conn.execute('PRAGMA journal_mode = WAL')
+    # En WAL, NORMAL no pierde integridad: a lo más las últimas transacciones si se va la luz
+    conn.execute('PRAGMA synchronous = NORMAL')
+    return conn
+
+
+def version_esquema(cursor, grupo):
+    """Versión del grupo de tablas ('productos' o 'facturas') guardada en PRAGMA user_version"""
+    user_version = cursor.execute('PRAGMA user_version').fetchone()[0]
+    return user_version // POSICION_VERSION[grupo] % 100
+
+
+def guardar_version_esquema(cursor, grupo, version):
+    """
+    Guarda la versión de un grupo de tablas sin tocar la de los demás; dentro
+    de una transacción se confirma (o se deshace) junto con la migración
+    """
+    user_version = cursor.execute('PRAGMA user_version').fetchone()[0]
+    posicion = POSICION_VERSION[grupo]
+    user_version += (version - user_version // posicion % 100) * posicion
+    cursor.execute(f'PRAGMA user_version = {user_version}')
+
+
+def es_bloqueo(error):
+    """True si un sqlite3.OperationalError es de base bloqueada u ocupada"""
+    mensaje = str(error).lower()
+    return 'locked' in mensaje or 'busy' in mensaje
+
+
+def espera_reintento(intento):
+    """Segundos a esperar antes del reintento `intento` (0, 1, ...): exponencial con jitter"""
+    return random.uniform(0, min(ESPERA_MAX_REINTENTO, ESPERA_BASE_REINTENTO * 2 ** intento))
+
+
+def escribir_con_reintentos(manager, escribir):
+    """
+    Ejecuta escribir() y confirma en manager.conn. Si la base está bloqueada
+    (otra caja tardó más que busy_timeout), deshace y vuelve a intentar hasta
+    manager.reintentos veces con espera aleatoria creciente, contando cada
+    reintento en manager.reintentos_por_bloqueo; retorna lo que retorne
+    escribir(). Los demás errores se propagan sin reintentar.
+    Lo usan InventarioManager y FacturaManager.
+    """
+    for intento in range(manager.reintentos + 1):
+        try:
+            resultado = escribir()
+            manager.conn.commit()
+            return resultado
+        except sqlite3.OperationalError as e:
+            manager.conn.rollback()
+            if not es_bloqueo(e) or intento == manager.reintentos:
+                raise
+            manager.reintentos_por_bloqueo += 1
+            time.sleep(espera_reintento(intento))
+
+
+class CacheLRU:
+    """
+    Caché LRU acotado cuyas entradas llevan la generación del catálogo con
+    que se calcularon: una entrada de otra generación no se sirve (cuenta
+    como obsoleta y como fallo). Lleva estadísticas de aciertos, fallos,
+    desalojos y obsoletas para dimensionarlo.
+    """
+    
+    def __init__(self, capacidad=TAMANO_CACHE_BUSQUEDAS):
+        self.capacidad = capacidad
+        self.entradas = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self.obsoletas = 0
+    
+    def obtener(self, clave, generacion):
+        """Retorna (True, valor) si hay una entrada vigente o (False, None)"""
+        entrada = self.entradas.get(clave)
+        if entrada is not None:
+            if entrada[0] == generacion:
+                self.entradas.move_to_end(clave)
+                self.aciertos += 1
+                return True, entrada[1]
+            del self.entradas[clave]
+            self.obsoletas += 1
+        
+        self.fallos += 1
+        return False, None
+    
+    def guardar(self, clave, generacion, valor):
+        """Guarda un valor; si se pasa de la capacidad desaloja el menos usado"""
+        if self.capacidad <= 0:
+            return
+        self.entradas[clave] = (generacion, valor)
+        self.entradas.move_to_end(clave)
+        if len(self.entradas) > self.capacidad:
+            self.entradas.popitem(last=False)
+            self.desalojos += 1
+    
+    def limpiar(self):
+        """Vacía el caché sin reiniciar las estadísticas"""
+        self.entradas.clear()
+    
+    def estadisticas(self):
+        """Aciertos, fallos, desalojos, obsoletas, entradas, capacidad y tasa de aciertos"""
+        consultas = self.aciertos + self.fallos
+        return {
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+            'desalojos': self.desalojos,
+            'obsoletas': self.obsoletas,
+            'entradas': len(self.entradas),
+            'capacidad': self.capacidad,
+            'tasa_aciertos': self.aciertos / consultas if consultas else 0.0
+        }
+
+
+class Producto:
+    """Producto del catálogo como registro ligero (sin el diccionario de atributos)"""
+    
+    __slots__ = ('upc', 'producto', 'precio', 'qty')
+    
+    def __init__(self, upc, producto, precio, qty):
+        self.upc = upc
+        self.producto = producto
+        self.precio = precio
+        self.qty = qty
+    
+    def __repr__(self):
+        return f'Producto({self.upc!r}, {self.producto!r}, {self.precio!r}, {self.qty!r})'
+    
+    def __eq__(self, otro):
+        if not isinstance(otro, Producto):
+            return NotImplemented
+        return self.a_tupla() == otro.a_tupla()
+    
+    # Registro mutable que se compara por valor: no es hashable a propósito
+    # (un hash por valor cambiaría al modificar sus campos)
+    __hash__ = None
+    
+    def a_tupla(self):
+        """Retorna (upc, producto, precio, qty)"""
+        return (self.upc, self.producto, self.precio, self.qty)
+    
+    def a_dict(self):
+        """Retorna el producto con el formato de diccionario del resto del módulo"""
+        return {'upc': self.upc, 'producto': self.producto, 'precio': self.precio, 'qty': self.qty}
+
+
+@contextmanager
+def _recolector_pausado():
+    """
+    Pausa el recolector de ciclos mientras se arma de golpe la lista completa
+    del catálogo (obtener_todos_productos). Los Producto no forman ciclos, pero
+    cada uno cuenta para disparar recolecciones que recorren otra vez todos los
+    ya creados. La pausa es de todo el proceso, así que solo se usa en esa
+    carga masiva y no alrededor de código general.
+    """
+    activo = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if activo:
+            gc.enable()
+
+
+def fila_a_dict(cursor, row):
+    """row_factory de sqlite3 para filas (upc, producto, precio, qty) como diccionario"""
+    return {'upc': row[0], 'producto': row[1], 'precio': row[2], 'qty': row[3]}
+
+
+def fila_a_producto(cursor, row):
+    """row_factory de sqlite3 que arma un Producto directo de la fila (upc, producto, precio, qty)"""
+    return Producto(row[0], row[1], row[2], row[3])
+
+
+def fabrica_productos(formato='dict'):
+    """
+    Retorna el row_factory de sqlite3 para el formato pedido: 'dict',
+    'tupla' (None: la fila tal cual) o 'registro' (Producto)
+    """
+    if formato not in FORMATOS_PRODUCTO:
+        raise ValueError(f"Formato de producto inválido: '{formato}'")
+    return {'dict': fila_a_dict, 'tupla': None, 'registro': fila_a_producto}[formato]
+
+
+def producto_en_formato(producto, formato='dict'):
+    """Convierte un producto en diccionario al formato pedido (siempre una copia)"""
+    if producto is None:
+        return None
+    if formato == 'tupla':
+        return (producto['upc'], producto['producto'], producto['precio'], producto['qty'])
+    if formato == 'registro':
+        return Producto(producto['upc'], producto['producto'], producto['precio'], producto['qty'])
+    return dict(producto)
+
+
+def _codificar_upcs(upcs):
+    """UPC en mayúsculas (solo ASCII, igual que LIKE de SQLite) como bytes"""
+    return [upc.encode('utf-8').upper() for upc in upcs]
+
+
+def _trigramas_upc(texto):
+    """Códigos enteros de los trigramas de un texto en bytes"""
+    return [(texto[i] << 16) | (texto[i + 1] << 8) | texto[i + 2] for i in range(len(texto) - 2)]
+
+
+class IndiceUPC:
+    """
+    Índice invertido de trigramas sobre los UPC del catálogo, en arreglos numpy
+    
+    - upcs: arreglo de bytes de ancho fijo con los UPC ordenados
+    - ids: productos.id de cada UPC (mismo orden)
+    - claves / inicios / filas: para cada trigrama (claves, ordenadas) la lista
+      de filas que lo contienen es filas[inicios[k]:inicios[k + 1]], en orden de UPC
+    
+    Las filas agregadas después de construirlo (ver agregar) quedan en una
+    lista pendiente que se revisa completa en cada búsqueda.
+    """
+    
+    def __init__(self, ids, upcs):
+        self.pendientes = []
+        self._construir(list(ids), list(upcs))
+    
+    @classmethod
+    def desde_conexion(cls, conn):
+        """Construye el índice con todos los productos de una conexión SQLite"""
+        cursor = conn.cursor()
+        cursor.execute('SELECT id, upc FROM productos')
+        filas = cursor.fetchall()
+        return cls([fila[0] for fila in filas], [fila[1] for fila in filas])
+    
+    def _construir(self, ids, upcs):
+        """Arma los arreglos del índice a partir de listas de ids y UPC"""
+        codificados = _codificar_upcs(upcs)
+        ancho = max((len(upc) for upc in codificados), default=1)
+        
+        upcs = np.array(codificados, dtype=f'S{ancho}')
+        ids = np.array(ids, dtype=np.int64)
+        orden = np.argsort(upcs, kind='stable')
+        self.upcs = upcs[orden]
+        self.ids = ids[orden]
+        self.max_id = int(ids.max()) if len(ids) else 0
+        
+        # Trigramas de cada UPC: los bytes de relleno (0) no forman trigramas
+        matriz = self.upcs.view(np.uint8).reshape(len(self.upcs), ancho)
+        if ancho >= 3:
+            codigos = ((matriz[:, :-2].astype(np.uint64) << 16)
+                       | (matriz[:, 1:-1].astype(np.uint64) << 8)
+                       | matriz[:, 2:])
+            validos = matriz[:, 2:] != 0
+            filas = np.broadcast_to(np.arange(len(self.upcs), dtype=np.uint64)[:, None],
+                                    codigos.shape)[validos]
+            # Una sola ordenación por (trigrama, fila); luego se quitan los
+            # repetidos (un UPC puede tener el mismo trigrama varias veces)
+            pares = (codigos[validos] << 32) | filas
+            pares.sort()
+            pares = pares[np.concatenate(([True], pares[1:] != pares[:-1]))]
+        else:
+            pares = np.array([], dtype=np.uint64)
+        
+        # Los pares ya vienen ordenados: cada trigrama empieza donde cambia el código
+        codigos = (pares >> 32).astype(np.uint32)
+        self.filas = (pares & 0xFFFFFFFF).astype(np.uint32)
+        cambios = np.flatnonzero(np.diff(codigos)) + 1
+        self.inicios = np.concatenate(([0], cambios, [len(codigos)])).astype(np.int64)
+        self.claves = codigos[self.inicios[:-1]] if len(codigos) else codigos
+    
+    def agregar(self, ids, upcs):
+        """
+        Agrega productos nuevos al índice. Quedan pendientes hasta que pasan
+        de MAX_PENDIENTES_INDICE_UPC, y entonces se reconstruye todo el índice.
+        """
+        self.pendientes.extend(zip(ids, _codificar_upcs(upcs)))
+        if self.pendientes:
+            self.max_id = max(self.max_id, max(id_producto for id_producto, _ in self.pendientes))
+        
+        if len(self.pendientes) > MAX_PENDIENTES_INDICE_UPC:
+            ids_totales = self.ids.tolist() + [id_producto for id_producto, _ in self.pendientes]
+            upcs_totales = ([upc.decode('utf-8') for upc in self.upcs.tolist()]
+                            + [upc.decode('utf-8') for _, upc in self.pendientes])
+            self.pendientes = []
+            self._construir(ids_totales, upcs_totales)
+    
+    def actualizar(self, conn):
+        """Agrega los productos insertados en la base después del último id indexado"""
+        cursor = conn.cursor()
+        cursor.execute('SELECT id, upc FROM productos WHERE id > ?', (self.max_id,))
+        filas = cursor.fetchall()
+        if filas:
+            self.agregar([fila[0] for fila in filas], [fila[1] for fila in filas])
+        return len(filas)
+    
+    def _lista(self, codigo):
+        """Filas que contienen el trigrama `codigo` (vacío si no existe)"""
+        posicion = np.searchsorted(self.claves, codigo)
+        if posicion == len(self.claves) or self.claves[posicion] != codigo:
+            return self.filas[:0]
+        return self.filas[self.inicios[posicion]:self.inicios[posicion + 1]]
+    
+    def buscar(self, texto):
+        """
+        Retorna los productos.id cuyo UPC contiene `texto` (sin distinguir
+        mayúsculas), en orden de UPC. `texto` se busca literal: % y _ no son comodines.
+        """
+        texto = texto.encode('utf-8').upper()
+        
+        if len(texto) < 3:
+            # Sin trigramas que buscar: se revisa todo el arreglo
+            candidatas = np.arange(len(self.upcs))
+        else:
+            # Partir de la lista más corta y recortarla con la siguiente
+            listas = sorted((self._lista(codigo) for codigo in set(_trigramas_upc(texto))), key=len)
+            candidatas = listas[0]
+            if len(listas) > 1 and len(candidatas) > 1000:
+                candidatas = np.intersect1d(candidatas, listas[1], assume_unique=True)
+        
+        # Con más de 3 caracteres los trigramas no garantizan la subcadena completa
+        if len(candidatas) and len(texto) != 3:
+            candidatas = candidatas[np.char.find(self.upcs[candidatas], texto) >= 0]
+        encontrados = [(upc, int(id_producto)) for upc, id_producto
+                       in zip(self.upcs[candidatas].tolist(), self.ids[candidatas].tolist())]
+        
+        extra = [(upc, id_producto) for id_producto, upc in self.pendientes if texto in upc]
+        if extra:
+            encontrados = sorted(encontrados + extra)
+        
+        return [id_producto for _, id_producto in encontrados]
+    
+    def memoria(self):
+        """Bytes ocupados por los arreglos del índice y las filas pendientes (aprox.)"""
+        arreglos = sum(arreglo.nbytes for arreglo in
+                       (self.upcs, self.ids, self.claves, self.inicios, self.filas))
+        return arreglos + sum(len(upc) + 64 for _, upc in self.pendientes)
+    
+    def __len__(self):
+        return len(self.upcs) + len(self.pendientes)
 
 
 class InventarioManager:
-    """Clase para gestionar el inventario de productos"""
+    """
+    Clase para gestionar el inventario de productos
     
-    def __init__(self, db_path='inventario.db'):
+    Con concurrente=True la conexión trabaja en modo WAL con busy_timeout y
+    BEGIN IMMEDIATE (ver conectar_db); actualizar_precio reintenta hasta
+    `reintentos` veces si encuentra la base bloqueada.
+    """
+    
+    def __init__(self, db_path='inventario.db', tamano_cache=TAMANO_CACHE_BUSQUEDAS,
+                 concurrente=False, espera_bloqueo=ESPERA_BLOQUEO, reintentos=REINTENTOS_ESCRITURA):
         self.db_path = db_path
         self.conn = None
+        self.concurrente = concurrente
+        self.espera_bloqueo = espera_bloqueo
+        self.reintentos = reintentos
+        self.reintentos_por_bloqueo = 0
+        self.indice_upc = None
+        self.version_indice_upc = None
+        self.migracion_productos = None
+        self.cache = CacheLRU(tamano_cache)
+        self.generacion_catalogo = 0
         self.inicializar_db()
     
     def inicializar_db(self):
         """Inicializa la base de datos SQLite"""
-        self.conn = sqlite3.connect(self.db_path)
+        self.conn = conectar_db(self.db_path, self.concurrente, self.espera_bloqueo)
         cursor = self.conn.cursor()
         
         # Crear tabla de productos
@@ -33,143 +1005,1196 @@ class InventarioManager:
                 producto TEXT NOT NULL,
                 precio REAL NOT NULL,
                 qty REAL DEFAULT 0,
+                huella INTEGER,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                gtin TEXT
+            )
+        ''')
+        
+        # Migrar bases de datos creadas antes de las columnas huella y gtin
+        columnas = {fila[1] for fila in cursor.execute('PRAGMA table_info(productos)')}
+        if 'huella' not in columnas:
+            cursor.execute('ALTER TABLE productos ADD COLUMN huella INTEGER')
+        if 'gtin' not in columnas:
+            cursor.execute('ALTER TABLE productos ADD COLUMN gtin TEXT')
+        if version_esquema(cursor, 'productos') < VERSION_PRODUCTOS:
+            self.migracion_productos = self._migrar_gtin()
+            guardar_version_esquema(cursor, 'productos', VERSION_PRODUCTOS)
+        
+        # Índice único del UPC normalizado (varios NULL no chocan entre sí)
+        cursor.execute(f'''
+            CREATE {'UNIQUE ' if CONFLICTO_GTIN else ''}INDEX IF NOT EXISTS idx_productos_gtin
+            ON productos (gtin)
+        ''')
+        
+        # Índice para búsquedas por prefijo de UPC sin distinguir mayúsculas
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_productos_upc_nocase
+            ON productos (upc COLLATE NOCASE)
+        ''')
+        
+        if FTS_TRIGRAMA:
+            self._crear_indice_upc()
+        if FTS_NOMBRES:
+            self._crear_indice_nombres()
+        
+        # Registro de UPC sintéticos de productos sin código de barras
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'upcs_sinteticos'")
+        registro_nuevo = cursor.fetchone() is None
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS upcs_sinteticos (
+                nombre TEXT PRIMARY KEY,
+                upc TEXT UNIQUE NOT NULL,
+                prefijo TEXT NOT NULL,
+                consecutivo INTEGER NOT NULL,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_upcs_sinteticos_prefijo
+            ON upcs_sinteticos (prefijo, consecutivo)
+        ''')
+        if registro_nuevo:
+            self._registrar_upcs_sinteticos_existentes()
+        
+        # Puntos de control de importaciones por bloques interrumpidas
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS puntos_control_importacion (
+                huella_archivo TEXT PRIMARY KEY,
+                archivo TEXT NOT NULL,
+                filas_confirmadas INTEGER NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
         
         self.conn.commit()
     
-    def importar_desde_csv(self, archivo_csv):
+    def _migrar_gtin(self):
+        """
+        Corrige los UPC guardados como decimal (ver _corregir_upcs_decimales)
+        y llena (o vuelve a calcular) la columna gtin de una base existente. Si
+        dos productos tienen el mismo GTIN (ej: 070038372806 y 70038372806)
+        solo el más antiguo lo recibe, para que el índice único se pueda crear.
+        Retorna {'upcs_corregidos': n, 'gtin_normalizados': n}.
+        """
+        cursor = self.conn.cursor()
+        corregidos = self._corregir_upcs_decimales()
+        cursor.execute('UPDATE productos SET gtin = NULL WHERE gtin IS NOT NULL')
+        cursor.execute(f'''
+            UPDATE productos SET gtin = {SQL_GTIN}
+            WHERE id IN (
+                SELECT MIN(id) FROM productos
+                WHERE {SQL_GTIN} IS NOT NULL
+                GROUP BY {SQL_GTIN}
+            )
+        ''')
+        return {'upcs_corregidos': corregidos, 'gtin_normalizados': cursor.rowcount}
+    
+    def _corregir_upcs_decimales(self):
+        """
+        Corrige los UPC que la versión original guardaba como número decimal
+        (pandas leía la columna como float: '70038372806.0'). Se quita el
+        '.0' y, si quedaron de 9 a 11 dígitos y con ceros a la izquierda forman
+        un UPC-A de 12 dígitos válido, se le devuelven esos ceros. Si el UPC
+        corregido ya existe (una importación posterior lo agregó bien escrito)
+        se conserva ese producto y se borra el antiguo. Retorna cuántos se corrigieron.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT id, upc FROM productos
+            WHERE upc GLOB '[0-9]*.0'
+              AND substr(upc, 1, length(upc) - 2) NOT GLOB '*[^0-9]*'
+            ORDER BY id
+        ''')
+        corregidos = 0
+        for id_producto, upc in cursor.fetchall():
+            codigo = upc[:-2]
+            if 9 <= len(codigo) <= 11 and normalizar_gtin(codigo.zfill(12)):
+                codigo = codigo.zfill(12)
+            
+            cursor.execute('SELECT 1 FROM productos WHERE upc = ?', (codigo,))
+            if cursor.fetchone():
+                cursor.execute('DELETE FROM productos WHERE id = ?', (id_producto,))
+            else:
+                cursor.execute('UPDATE productos SET upc = ?, huella = NULL WHERE id = ?',
+                               (codigo, id_producto))
+            corregidos += 1
+        return corregidos
+    
+    def _crear_indice_upc(self):
+        """
+        Crea el índice FTS5 de trigramas sobre productos.upc y los triggers que
+        lo mantienen sincronizado. Es un índice de contenido externo: solo
+        guarda los trigramas y lee el UPC de la tabla productos.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'productos_upc_fts'")
+        indice_nuevo = cursor.fetchone() is None
+        
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS productos_upc_fts USING fts5(
+                upc, content='productos', content_rowid='id', tokenize='trigram'
+            )
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS productos_upc_fts_insertar AFTER INSERT ON productos
+            BEGIN
+                INSERT INTO productos_upc_fts (rowid, upc) VALUES (new.id, new.upc);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS productos_upc_fts_borrar AFTER DELETE ON productos
+            BEGIN
+                INSERT INTO productos_upc_fts (productos_upc_fts, rowid, upc)
+                VALUES ('delete', old.id, old.upc);
+            END
+        ''')
+        # Las importaciones solo actualizan precio, qty y huella, así que este
+        # trigger no se dispara en una reimportación
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS productos_upc_fts_actualizar AFTER UPDATE OF upc ON productos
+            BEGIN
+                INSERT INTO productos_upc_fts (productos_upc_fts, rowid, upc)
+                VALUES ('delete', old.id, old.upc);
+                INSERT INTO productos_upc_fts (rowid, upc) VALUES (new.id, new.upc);
+            END
+        ''')
+        
+        # Bases de datos creadas antes del índice
+        if indice_nuevo:
+            cursor.execute("INSERT INTO productos_upc_fts (productos_upc_fts) VALUES ('rebuild')")
+    
+    def _crear_indice_nombres(self):
+        """
+        Crea el índice FTS5 de palabras sobre productos.producto (ver
+        buscar_por_nombre) y sus triggers. El tokenizador unicode61 con
+        remove_diacritics 2 quita los acentos al indexar y al buscar, así que
+        'platano' encuentra 'PLÁTANO'.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'productos_nombre_fts'")
+        indice_nuevo = cursor.fetchone() is None
+        
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS productos_nombre_fts USING fts5(
+                producto, content='productos', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS productos_nombre_fts_insertar AFTER INSERT ON productos
+            BEGIN
+                INSERT INTO productos_nombre_fts (rowid, producto) VALUES (new.id, new.producto);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS productos_nombre_fts_borrar AFTER DELETE ON productos
+            BEGIN
+                INSERT INTO productos_nombre_fts (productos_nombre_fts, rowid, producto)
+                VALUES ('delete', old.id, old.producto);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS productos_nombre_fts_actualizar
+            AFTER UPDATE OF producto ON productos
+            BEGIN
+                INSERT INTO productos_nombre_fts (productos_nombre_fts, rowid, producto)
+                VALUES ('delete', old.id, old.producto);
+                INSERT INTO productos_nombre_fts (rowid, producto) VALUES (new.id, new.producto);
+            END
+        ''')
+        
+        # Bases de datos creadas antes del índice
+        if indice_nuevo:
+            cursor.execute("INSERT INTO productos_nombre_fts (productos_nombre_fts) VALUES ('rebuild')")
+    
+    def _registrar_upcs_sinteticos_existentes(self):
+        """
+        Llena el registro de UPC sintéticos con los productos importados antes
+        de que existiera (ej: CILANTRO001), para que las reimportaciones y las
+        facturas ya guardadas sigan usando el mismo código
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT upc, producto FROM productos WHERE upc GLOB '[A-Z]*[0-9][0-9][0-9]' ORDER BY id")
+        existentes = cursor.fetchall()
+        if not existentes:
+            return
+        
+        nombres = normalizar_nombres(pd.Series([producto for _, producto in existentes], dtype=object))
+        registros = []
+        for (upc, producto), nombre in zip(existentes, nombres):
+            prefijo = prefijo_upc_sintetico(producto)
+            consecutivo = upc[len(prefijo):]
+            if prefijo and upc.startswith(prefijo) and consecutivo.isdigit():
+                registros.append((nombre, upc, prefijo, int(consecutivo)))
+        
+        cursor.executemany('''
+            INSERT OR IGNORE INTO upcs_sinteticos (nombre, upc, prefijo, consecutivo)
+            VALUES (?, ?, ?, ?)
+        ''', registros)
+    
+    def importar_desde_csv(self, archivo_csv, tamano_lote=TAMANO_LOTE, motor=None, delta=False,
+                           reemplazar=False, validar=True, progreso=None,
+                           max_fraccion_eliminada=MAX_FRACCION_ELIMINADA):
         """
         Importa productos desde un archivo CSV
         Formato esperado: UPC, QTY, PRODUCT, PRICE, TOTAL (con encabezados en fila 1)
+        
+        La limpieza se hace por columnas y la escritura en bloque a través de
+        una tabla temporal, todo dentro de una sola transacción.
+        `motor` elige el lector de pandas ('c' o 'pyarrow'; por defecto MOTOR_CSV).
+        Con delta=True solo se escriben productos nuevos o con cambios y con
+        reemplazar=True el archivo sustituye al catálogo completo
+        (ver _fusionar_staging y _reemplazar_catalogo); el reemplazo se rechaza
+        si eliminaría más de `max_fraccion_eliminada` del catálogo (1.0 lo permite todo).
+        Con validar=True las filas inválidas no se importan y se escriben con su
+        motivo en un CSV de cuarentena (ver validar_productos).
+        `progreso` recibe el avance al terminar (ver _reportar_progreso).
         """
         try:
-            # Leer CSV con pandas
-            df = pd.read_csv(archivo_csv, encoding='utf-8')
+            inicio = time.perf_counter()
+            estadisticas = self._iniciar_importacion(delta, reemplazar, validar)
+            cuarentena = ruta_cuarentena(archivo_csv)
             
-            # Verificar columnas requeridas
-            columnas_requeridas = ['UPC', 'QTY', 'PRODUCT', 'PRICE']
-            for col in columnas_requeridas:
-                if col not in df.columns:
-                    raise ValueError(f"Columna '{col}' no encontrada en el CSV")
+            # Leer CSV con tipos explícitos
+            with medir_fase(estadisticas, 'lectura'):
+                df = leer_csv(archivo_csv, motor)
+            verificar_columnas(df)
             
-            # Limpiar datos
-            productos_procesados = 0
-            productos_sin_upc = {}
+            # Validar, limpiar y escribir en la base de datos
+            self._procesar_bloque(df, estadisticas, cuarentena, tamano_lote, delta, reemplazar, validar)
             
-            cursor = self.conn.cursor()
+            with medir_fase(estadisticas, 'escritura'):
+                self._terminar_importacion(estadisticas, delta, reemplazar, max_fraccion_eliminada)
+                self.conn.commit()
+            self._reportar_progreso(progreso, estadisticas, inicio, 1.0)
+            return self._resultado_importacion(estadisticas, inicio)
             
-            for idx, row in df.iterrows():
-                upc = str(row['UPC']).strip()
-                producto = str(row['PRODUCT']).strip()
-                qty = float(row['QTY']) if pd.notna(row['QTY']) else 0
-                
-                # Limpiar precio (eliminar símbolo $)
-                precio_str = str(row['PRICE']).replace('$', '').replace(',', '').strip()
-                precio = float(precio_str) if precio_str else 0.0
-                
-                # Asignar identificador único a productos sin UPC
-                if pd.isna(row['UPC']) or upc == 'nan' or upc == '':
-                    # Generar identificador único basado en el nombre del producto
-                    producto_key = re.sub(r'[^A-Z]', '', producto.upper())[:10]
-                    
-                    if producto_key not in productos_sin_upc:
-                        productos_sin_upc[producto_key] = 1
-                    else:
-                        productos_sin_upc[producto_key] += 1
-                    
-                    upc = f"{producto_key}{productos_sin_upc[producto_key]:03d}"
-                
-                # Insertar o actualizar producto
-                try:
-                    cursor.execute('''
-                        INSERT INTO productos (upc, producto, precio, qty)
-                        VALUES (?, ?, ?, ?)
-                        ON CONFLICT(upc) DO UPDATE SET
-                            precio = excluded.precio,
-                            qty = excluded.qty
-                    ''', (upc, producto, precio, qty))
-                    productos_procesados += 1
-                except sqlite3.IntegrityError as e:
-                    print(f"Error al insertar producto {producto}: {e}")
-            
-            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
             return {
-                'success': True,
-                'productos_procesados': productos_procesados,
-                'mensaje': f'Se importaron {productos_procesados} productos exitosamente'
+                'success': False,
+                'error': str(e)
             }
+    
+    def importar_desde_csv_por_bloques(self, archivo_csv, filas_por_bloque=FILAS_POR_BLOQUE,
+                                       tamano_lote=TAMANO_LOTE, delta=False, reemplazar=False,
+                                       validar=True, progreso=None, reanudar=True,
+                                       max_fraccion_eliminada=MAX_FRACCION_ELIMINADA):
+        """
+        Importa productos desde un CSV leyéndolo en bloques de `filas_por_bloque`
+        filas, para archivos más grandes que la memoria disponible.
+        Use '-' como archivo para leer desde la entrada estándar.
+        
+        Cada bloque se confirma (commit) al terminar de escribirse. Los
+        productos sin UPC reciben su código del registro upcs_sinteticos, así
+        que los identificadores no dependen del tamaño de bloque.
+        Con reemplazar=True los bloques se acumulan en la tabla temporal y el
+        catálogo se sustituye en una sola transacción al final (ver
+        `max_fraccion_eliminada` en importar_desde_csv).
+        
+        Junto con cada bloque se guarda un punto de control (hash del archivo y
+        filas confirmadas). Si la importación se interrumpe, la siguiente
+        llamada con el mismo archivo y reanudar=True continúa desde la primera
+        fila no confirmada. Un archivo modificado tiene otro hash y se importa
+        desde el principio. `progreso` recibe el avance después de cada bloque
+        (ver _reportar_progreso).
+        """
+        estadisticas = {'productos_procesados': 0, 'bloques': 0, 'filas_confirmadas': 0}
+        
+        try:
+            inicio = time.perf_counter()
+            estadisticas.update(self._iniciar_importacion(delta, reemplazar, validar))
+            cuarentena = ruta_cuarentena(archivo_csv)
+            
+            # Sin punto de control para stdin (no se puede releer) ni al reemplazar,
+            # donde nada se confirma hasta el final
+            huella = None
+            if archivo_csv != '-' and not reemplazar:
+                with medir_fase(estadisticas, 'lectura'):
+                    huella = huella_archivo(archivo_csv)
+                if reanudar:
+                    estadisticas['filas_confirmadas'] = self._leer_punto_control(huella)
+            filas_omitidas = estadisticas['filas_confirmadas']
+            if filas_omitidas:
+                estadisticas['reanudado_desde_fila'] = filas_omitidas
+            
+            if archivo_csv == '-':
+                origen, tamano = nullcontext(sys.stdin), None
+            else:
+                origen, tamano = open(archivo_csv, 'rb'), os.path.getsize(archivo_csv)
+            
+            with origen as archivo, \
+                    closing(leer_csv_por_bloques(archivo, filas_por_bloque, filas_omitidas)) as bloques:
+                while True:
+                    with medir_fase(estadisticas, 'lectura'):
+                        df = next(bloques, None)
+                    if df is None:
+                        break
+                    
+                    verificar_columnas(df)
+                    filas_bloque = len(df)
+                    self._procesar_bloque(df, estadisticas, cuarentena, tamano_lote, delta,
+                                          reemplazar, validar)
+                    
+                    with medir_fase(estadisticas, 'escritura'):
+                        estadisticas['filas_confirmadas'] += filas_bloque
+                        if huella is not None:
+                            self._guardar_punto_control(huella, archivo_csv,
+                                                        estadisticas['filas_confirmadas'])
+                        self.conn.commit()
+                    estadisticas['bloques'] += 1
+                    
+                    fraccion = archivo.tell() / tamano if tamano else None
+                    self._reportar_progreso(progreso, estadisticas, inicio, fraccion)
+            
+            with medir_fase(estadisticas, 'escritura'):
+                # Al reanudar solo se conocen los UPC de la parte final del archivo
+                self._terminar_importacion(estadisticas, delta and not filas_omitidas, reemplazar,
+                                           max_fraccion_eliminada)
+                if huella is not None:
+                    self._borrar_punto_control(huella)
+                self.conn.commit()
+            return self._resultado_importacion(estadisticas, inicio)
             
         except Exception as e:
+            self.conn.rollback()
             return {
                 'success': False,
-                'error': str(e)
+                'error': str(e),
+                **estadisticas
             }
     
-    def importar_desde_excel(self, archivo_excel, sheet_name='Sheet 1'):
+    def importar_desde_excel(self, archivo_excel, sheet_name='Sheet 1', streaming=False,
+                             filas_por_bloque=FILAS_POR_BLOQUE, tamano_lote=TAMANO_LOTE,
+                             delta=False, reemplazar=False, validar=True, progreso=None,
+                             max_fraccion_eliminada=MAX_FRACCION_ELIMINADA):
         """
         Importa productos desde un archivo Excel
+        
+        Con sheet_name=None se importan todas las hojas del libro en una sola
+        llamada. Con streaming=True el libro se lee con openpyxl en modo de solo
+        lectura, en bloques de `filas_por_bloque` filas, para libros muy grandes.
+        `progreso` recibe el avance después de cada hoja o bloque; en modo
+        streaming no se conoce el total de filas, así que no hay ETA.
+        `delta`, `reemplazar` y `max_fraccion_eliminada` funcionan como en
+        importar_desde_csv.
         """
         try:
-            # Leer Excel con pandas
-            df = pd.read_excel(archivo_excel, sheet_name=sheet_name)
-            
-            # Guardar temporalmente como CSV y usar función de importación
-            temp_csv = '/tmp/temp_import.csv'
-            df.to_csv(temp_csv, index=False)
+            inicio = time.perf_counter()
+            estadisticas = self._iniciar_importacion(delta, reemplazar, validar)
+            estadisticas['hojas'] = []
+            cuarentena = ruta_cuarentena(archivo_excel)
             
-            resultado = self.importar_desde_csv(temp_csv)
+            if streaming:
+                bloques = leer_excel_por_bloques(archivo_excel, sheet_name, filas_por_bloque)
+                total_filas = None
+            else:
+                with medir_fase(estadisticas, 'lectura'):
+                    datos = pd.read_excel(archivo_excel, sheet_name=sheet_name, dtype=TIPOS_COLUMNAS)
+                bloques = list(datos.items()) if isinstance(datos, dict) else [(sheet_name, datos)]
+                total_filas = sum(len(df) for _, df in bloques)
             
-            # Limpiar archivo temporal
-            Path(temp_csv).unlink(missing_ok=True)
+            bloques = iter(bloques)
+            filas_leidas = 0
+            while True:
+                with medir_fase(estadisticas, 'lectura'):
+                    hoja, df = next(bloques, (None, None))
+                if df is None:
+                    break
+                
+                try:
+                    verificar_columnas(df)
+                except ValueError as e:
+                    raise ValueError(f"Hoja '{hoja}': {e}")
+                
+                filas_leidas += len(df)
+                self._procesar_bloque(df, estadisticas, cuarentena, tamano_lote, delta,
+                                      reemplazar, validar)
+                if hoja not in estadisticas['hojas']:
+                    estadisticas['hojas'].append(hoja)
+                
+                fraccion = filas_leidas / total_filas if total_filas else None
+                self._reportar_progreso(progreso, estadisticas, inicio, fraccion)
             
-            return resultado
+            with medir_fase(estadisticas, 'escritura'):
+                self._terminar_importacion(estadisticas, delta, reemplazar, max_fraccion_eliminada)
+                self.conn.commit()
+            return self._resultado_importacion(estadisticas, inicio)
             
         except Exception as e:
+            self.conn.rollback()
             return {
                 'success': False,
                 'error': str(e)
             }
     
-    def buscar_por_upc_parcial(self, upc_parcial):
+    def importar_archivos(self, ruta, procesos=None, tamano_lote=TAMANO_LOTE, motor=None,
+                          sheet_name='Sheet 1', validar=True, progreso=None):
         """
-        Busca productos por UPC parcial (case-insensitive)
-        Retorna lista de productos que coincidan
+        Importa todos los archivos CSV/Excel de una carpeta o de un patrón glob
+        (ej: 'proveedores/*.csv')
+        
+        La lectura y limpieza de los archivos se reparte entre `procesos`
+        procesos (por defecto uno por núcleo). Los DataFrames limpios vuelven
+        en el orden de los archivos a este proceso, que es el único que escribe
+        en SQLite. Cada archivo se confirma por separado, así que un archivo con
+        errores no impide importar los demás. `progreso` recibe el avance
+        después de cada archivo, estimado con el tamaño de los archivos.
+        """
+        inicio = time.perf_counter()
+        archivos = buscar_archivos_importacion(ruta)
+        
+        if not archivos:
+            return {
+                'success': False,
+                'error': f'No se encontraron archivos CSV/Excel en {ruta}'
+            }
+        
+        procesos = min(procesos or os.cpu_count() or 1, len(archivos))
+        resultados = []
+        totales = {'productos_procesados': 0, 'rechazados': 0, 'filas_sin_precio': 0,
+                   'tiempos': dict.fromkeys(FASES_IMPORTACION, 0.0)}
+        tamano_total = sum(os.path.getsize(archivo) for archivo in archivos)
+        tamano_importado = 0
+        
+        if procesos > 1:
+            ejecutor = ProcessPoolExecutor(max_workers=procesos)
+            lecturas = ejecutor.map(leer_y_limpiar_archivo, archivos, [motor] * len(archivos),
+                                    [sheet_name] * len(archivos), [validar] * len(archivos))
+        else:
+            ejecutor = None
+            lecturas = (leer_y_limpiar_archivo(archivo, motor, sheet_name, validar)
+                        for archivo in archivos)
+        
+        try:
+            for archivo, (productos, rechazados, error, tiempos) in zip(archivos, lecturas):
+                resultado = {'archivo': archivo, 'duracion_lectura': sum(tiempos.values())}
+                
+                if error is None:
+                    try:
+                        estadisticas = self._iniciar_importacion(validar=validar)
+                        estadisticas['tiempos'].update(tiempos)
+                        with medir_fase(estadisticas, 'escritura'):
+                            if validar:
+                                self._registrar_rechazados(rechazados, estadisticas,
+                                                           ruta_cuarentena(archivo))
+                            self._escribir_productos(productos, estadisticas, tamano_lote)
+                            self.conn.commit()
+                        resultado.update(success=True, **estadisticas)
+                        totales['productos_procesados'] += estadisticas['productos_procesados']
+                        totales['rechazados'] += estadisticas.get('rechazados', 0)
+                        totales['filas_sin_precio'] += estadisticas['filas_sin_precio']
+                        for fase, duracion in estadisticas['tiempos'].items():
+                            totales['tiempos'][fase] += duracion
+                    except Exception as e:
+                        self.conn.rollback()
+                        error = str(e)
+                
+                if error is not None:
+                    resultado.update(success=False, error=error)
+                resultados.append(resultado)
+                
+                tamano_importado += os.path.getsize(archivo)
+                self._reportar_progreso(progreso, totales, inicio,
+                                        tamano_importado / tamano_total if tamano_total else None)
+        finally:
+            if ejecutor is not None:
+                ejecutor.shutdown()
+        
+        duracion = time.perf_counter() - inicio
+        productos_procesados = totales['productos_procesados']
+        rechazados = totales['rechazados']
+        filas_por_segundo = productos_procesados / duracion if duracion > 0 else 0.0
+        importados = sum(1 for resultado in resultados if resultado['success'])
+        self._actualizar_indice_memoria()
+        
+        return {
+            'success': True,
+            'archivos': resultados,
+            'archivos_importados': importados,
+            'archivos_con_error': len(resultados) - importados,
+            'procesos': procesos,
+            'productos_procesados': productos_procesados,
+            'rechazados': rechazados,
+            'filas_sin_precio': totales['filas_sin_precio'],
+            'tiempos': totales['tiempos'],
+            'duracion_segundos': duracion,
+            'filas_por_segundo': filas_por_segundo,
+            'mensaje': (f'Se importaron {productos_procesados} productos de {importados} '
+                        f'de {len(resultados)} archivos; {rechazados} filas rechazadas '
+                        f'({filas_por_segundo:,.0f} filas/seg)')
+        }
+    
+    def _iniciar_importacion(self, delta=False, reemplazar=False, validar=False):
         """
+        Prepara los contadores de una importación y las tablas temporales:
+        productos_staging recibe las filas limpias y upcs_importados guarda
+        los UPC vistos en el archivo (modo delta)
+        """
+        estadisticas = {'productos_procesados': 0, 'filas_sin_precio': 0,
+                        'tiempos': dict.fromkeys(FASES_IMPORTACION, 0.0)}
+        if delta:
+            estadisticas.update({'insertados': 0, 'actualizados': 0, 'sin_cambios': 0})
+        if validar:
+            estadisticas.update({'rechazados': 0, 'rechazos_por_motivo': {},
+                                 'archivo_cuarentena': None})
+        
         cursor = self.conn.cursor()
+        cursor.execute('''
+            CREATE TEMP TABLE IF NOT EXISTS productos_staging (
+                upc TEXT NOT NULL,
+                producto TEXT NOT NULL,
+                precio REAL NOT NULL,
+                qty REAL,
+                huella INTEGER,
+                gtin TEXT
+            )
+        ''')
+        cursor.execute('CREATE TEMP TABLE IF NOT EXISTS upcs_importados (upc TEXT PRIMARY KEY)')
+        cursor.execute('DELETE FROM temp.productos_staging')
+        cursor.execute('DELETE FROM temp.upcs_importados')
+        # En modo concurrente el DELETE abre BEGIN IMMEDIATE; confirmar aquí
+        # suelta el bloqueo de escritura mientras se lee, se calcula el hash y
+        # se valida el archivo, y solo se vuelve a tomar al escribir el bloque
+        self.conn.commit()
         
-        # Búsqueda insensible a mayúsculas/minúsculas
-        query = '''
-            SELECT upc, producto, precio, qty
+        return estadisticas
+    
+    def _procesar_bloque(self, df, estadisticas, archivo_cuarentena, tamano_lote=TAMANO_LOTE,
+                         delta=False, reemplazar=False, validar=True):
+        """
+        Valida, limpia y escribe un DataFrame leído (ver _escribir_productos),
+        sumando la duración de cada fase a estadisticas['tiempos']; no hace commit
+        """
+        if validar:
+            with medir_fase(estadisticas, 'validacion'):
+                df = self._separar_rechazados(df, estadisticas, archivo_cuarentena)
+        with medir_fase(estadisticas, 'limpieza'):
+            productos = limpiar_productos(df)
+        with medir_fase(estadisticas, 'escritura'):
+            self._escribir_productos(productos, estadisticas, tamano_lote, delta, reemplazar)
+    
+    def _reportar_progreso(self, progreso, estadisticas, inicio, fraccion=None):
+        """
+        Llama a `progreso` (si se indicó) con un diccionario de avance:
+        filas (procesadas + rechazadas), filas_por_segundo, fraccion completada
+        (0 a 1, o None si no se conoce el total), eta_segundos y tiempos por fase
+        """
+        if progreso is None:
+            return
+        
+        transcurrido = time.perf_counter() - inicio
+        filas = estadisticas['productos_procesados'] + estadisticas.get('rechazados', 0)
+        eta = transcurrido * (1 - fraccion) / fraccion if fraccion else None
+        
+        progreso({
+            'filas': filas,
+            'filas_por_segundo': filas / transcurrido if transcurrido > 0 else 0.0,
+            'fraccion': fraccion,
+            'eta_segundos': eta,
+            'tiempos': dict(estadisticas['tiempos'])
+        })
+    
+    def _leer_punto_control(self, huella):
+        """Filas ya confirmadas de una importación interrumpida del archivo con esa huella"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT filas_confirmadas FROM puntos_control_importacion
+            WHERE huella_archivo = ?
+        ''', (huella,))
+        fila = cursor.fetchone()
+        return fila[0] if fila else 0
+    
+    def _guardar_punto_control(self, huella, archivo, filas_confirmadas):
+        """Guarda el avance de una importación por bloques; se confirma junto con el bloque"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            INSERT INTO puntos_control_importacion (huella_archivo, archivo, filas_confirmadas)
+            VALUES (?, ?, ?)
+            ON CONFLICT(huella_archivo) DO UPDATE SET
+                filas_confirmadas = excluded.filas_confirmadas,
+                updated_at = CURRENT_TIMESTAMP
+        ''', (huella, str(archivo), filas_confirmadas))
+    
+    def _borrar_punto_control(self, huella):
+        """Elimina el punto de control de una importación terminada"""
+        cursor = self.conn.cursor()
+        cursor.execute('DELETE FROM puntos_control_importacion WHERE huella_archivo = ?', (huella,))
+    
+    def _separar_rechazados(self, df, estadisticas, archivo_cuarentena):
+        """Valida un DataFrame leído, registra sus rechazos y retorna las filas válidas"""
+        validos, rechazados = validar_productos(df)
+        self._registrar_rechazados(rechazados, estadisticas, archivo_cuarentena)
+        return validos
+    
+    def _registrar_rechazados(self, rechazados, estadisticas, archivo_cuarentena):
+        """
+        Suma los rechazos por motivo y agrega las filas al CSV de cuarentena,
+        que se crea con el primer rechazo de la importación
+        """
+        if rechazados is None or rechazados.empty:
+            return
+        
+        estadisticas['rechazados'] += len(rechazados)
+        por_motivo = estadisticas['rechazos_por_motivo']
+        for motivo, cantidad in rechazados['MOTIVO'].str.split('; ').explode().value_counts().items():
+            por_motivo[motivo] = por_motivo.get(motivo, 0) + int(cantidad)
+        
+        archivo_cuarentena = Path(archivo_cuarentena)
+        archivo_cuarentena.parent.mkdir(parents=True, exist_ok=True)
+        nuevo = estadisticas['archivo_cuarentena'] is None
+        rechazados.to_csv(archivo_cuarentena, mode='w' if nuevo else 'a', header=nuevo,
+                          index=False, encoding='utf-8')
+        estadisticas['archivo_cuarentena'] = str(archivo_cuarentena)
+    
+    def _terminar_importacion(self, estadisticas, delta=False, reemplazar=False,
+                              max_fraccion_eliminada=MAX_FRACCION_ELIMINADA):
+        """
+        Aplica el reemplazo del catálogo si se pidió y, en modo delta,
+        cuenta los productos que ya no vienen en el archivo
+        """
+        if reemplazar:
+            self._reemplazar_catalogo(estadisticas, delta, max_fraccion_eliminada)
+        
+        if delta:
+            cursor = self.conn.cursor()
+            cursor.execute('''
+                SELECT COUNT(*) FROM productos
+                WHERE upc NOT IN (SELECT upc FROM temp.upcs_importados)
+            ''')
+            estadisticas['desaparecidos'] = cursor.fetchone()[0]
+    
+    def _escribir_productos(self, productos, estadisticas, tamano_lote=TAMANO_LOTE, delta=False,
+                            reemplazar=False):
+        """
+        Carga productos ya limpios (ver limpiar_productos) en la tabla temporal
+        productos_staging con un executemany por lote y, salvo que se esté
+        reemplazando el catálogo, los fusiona de inmediato con productos.
+        Actualiza los contadores de `estadisticas`; no hace commit.
+        """
+        # Un precio NaN violaría la restricción NOT NULL de la tabla: esas
+        # filas se omiten y se cuentan en estadisticas['filas_sin_precio']
+        sin_precio = productos['precio'].isna()
+        estadisticas['filas_sin_precio'] += int(sin_precio.sum())
+        productos = productos[~sin_precio]
+        productos = self._asignar_upcs_sinteticos(productos)
+        productos = productos.assign(gtin=normalizar_gtins(productos['upc']))
+        self._registrar_conflictos_gtin(productos, estadisticas)
+        
+        cursor = self.conn.cursor()
+        estadisticas['productos_procesados'] += len(productos)
+        
+        # En modo delta cada UPC se cuenta una vez, con su última fila
+        if delta:
+            productos = productos.drop_duplicates('upc', keep='last')
+        
+        for inicio in range(0, len(productos), tamano_lote):
+            lote = productos.iloc[inicio:inicio + tamano_lote]
+            cursor.executemany('''
+                INSERT INTO temp.productos_staging (upc, producto, precio, qty, huella, gtin)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', lote.itertuples(index=False, name=None))
+        
+        if not reemplazar:
+            self._fusionar_staging(estadisticas, delta)
+    
+    def _asignar_upcs_sinteticos(self, productos):
+        """
+        Asigna su UPC sintético a los productos sin UPC (upc None) usando el
+        registro upcs_sinteticos: un nombre ya registrado conserva su código y
+        uno nuevo recibe el siguiente consecutivo de su prefijo (CILANTRO001,
+        CILANTRO002...). Los registros nuevos se guardan con la importación.
+        
+        El registro se lee ya dentro de la transacción de escritura (BEGIN
+        IMMEDIATE), así dos importaciones a la vez no toman el mismo consecutivo.
+        """
+        sin_upc = productos['upc'].isna().to_numpy()
+        if not sin_upc.any():
+            return productos
+        
+        cursor = self.conn.cursor()
+        if not self.conn.in_transaction:
+            cursor.execute('BEGIN IMMEDIATE')
+        nombres = normalizar_nombres(productos.loc[sin_upc, 'producto'])
+        
+        codigos = {}
+        unicos = list(dict.fromkeys(nombres))
+        for inicio in range(0, len(unicos), TAMANO_LOTE_IN):
+            lote = unicos[inicio:inicio + TAMANO_LOTE_IN]
+            marcadores = ','.join('?' * len(lote))
+            cursor.execute(f'SELECT nombre, upc FROM upcs_sinteticos WHERE nombre IN ({marcadores})', lote)
+            codigos.update(cursor.fetchall())
+        
+        # Registrar los nombres nuevos con el siguiente consecutivo de su prefijo
+        nuevos = {}
+        for nombre, producto in zip(nombres, productos.loc[sin_upc, 'producto']):
+            if nombre not in codigos and nombre not in nuevos:
+                nuevos[nombre] = prefijo_upc_sintetico(producto)
+        
+        siguientes = {}
+        for nombre, prefijo in nuevos.items():
+            if prefijo not in siguientes:
+                # También se revisa productos por si el código ya existe fuera del registro
+                cursor.execute('''
+                    SELECT MAX(consecutivo) FROM (
+                        SELECT consecutivo FROM upcs_sinteticos WHERE prefijo = ?
+                        UNION ALL
+                        SELECT CAST(substr(upc, ?) AS INTEGER) FROM productos
+                        WHERE upc GLOB ? || '[0-9][0-9][0-9]*'
+                          AND substr(upc, ?) NOT GLOB '*[^0-9]*'
+                    )
+                ''', (prefijo, len(prefijo) + 1, prefijo, len(prefijo) + 1))
+                siguientes[prefijo] = (cursor.fetchone()[0] or 0) + 1
+            
+            consecutivo = siguientes[prefijo]
+            siguientes[prefijo] += 1
+            codigos[nombre] = f'{prefijo}{consecutivo:03d}'
+            cursor.execute('''
+                INSERT INTO upcs_sinteticos (nombre, upc, prefijo, consecutivo)
+                VALUES (?, ?, ?, ?)
+            ''', (nombre, codigos[nombre], prefijo, consecutivo))
+        
+        productos = productos.copy()
+        productos.loc[sin_upc, 'upc'] = nombres.map(codigos).to_numpy()
+        productos.loc[sin_upc, 'huella'] = calcular_huellas(productos[sin_upc])
+        return productos
+    
+    def _fusionar_staging(self, estadisticas, delta=False):
+        """
+        Fusiona productos_staging con productos en una sola sentencia
+        INSERT ... SELECT ... ON CONFLICT DO UPDATE y vacía la tabla temporal
+        
+        En modo delta la fusión omite las filas cuya huella coincide con la
+        guardada en la última importación, así que solo se escriben productos
+        nuevos o con cambios.
+        """
+        cursor = self.conn.cursor()
+        self.generacion_catalogo += 1
+        
+        if delta:
+            # Un UPC escrito con otra forma cuenta como visto con el UPC del producto existente
+            cursor.execute('''
+                INSERT OR IGNORE INTO temp.upcs_importados (upc)
+                SELECT COALESCE(
+                    (SELECT p.upc FROM productos AS p WHERE p.gtin = s.gtin),
+                    s.upc)
+                FROM temp.productos_staging AS s
+            ''')
+            cursor.execute('SELECT COUNT(*) FROM temp.productos_staging')
+            preparados = cursor.fetchone()[0]
+            cursor.execute('SELECT COUNT(*) FROM productos')
+            antes = cursor.fetchone()[0]
+            
+            cursor.execute(SQL_FUSIONAR_STAGING_DELTA)
+            escritos = cursor.rowcount
+            
+            cursor.execute('SELECT COUNT(*) FROM productos')
+            insertados = cursor.fetchone()[0] - antes
+            estadisticas['insertados'] += insertados
+            estadisticas['actualizados'] += escritos - insertados
+            estadisticas['sin_cambios'] += preparados - escritos
+        else:
+            cursor.execute(SQL_FUSIONAR_STAGING)
+        
+        cursor.execute('DELETE FROM temp.productos_staging')
+    
+    def _registrar_conflictos_gtin(self, productos, estadisticas):
+        """
+        Busca en un bloque de productos los UPC escritos de distinta forma con
+        el mismo GTIN-14 (ej: 70038372806 y 070038372806 en el mismo archivo).
+        Son el mismo producto con dos filas que no se sabe cuál vale: la fusión
+        se queda con la última, como con un UPC repetido, y las anteriores se
+        listan en estadisticas['conflictos_gtin'] con el UPC de la fila que se
+        usó. Un UPC con otra forma que un producto existente no es conflicto:
+        actualiza ese producto (ver SQL_FUSIONAR_STAGING).
+        """
+        if not CONFLICTO_GTIN:
+            return
+        
+        con_gtin = productos[productos['gtin'].notna()]
+        if not con_gtin['gtin'].duplicated().any():
+            return
+        
+        usados = con_gtin.drop_duplicates('gtin', keep='last').set_index('gtin')['upc']
+        conflictos = con_gtin[con_gtin['upc'] != con_gtin['gtin'].map(usados)]
+        estadisticas.setdefault('conflictos_gtin', []).extend(
+            {'upc': upc, 'producto': producto, 'upc_usado': usados[gtin]}
+            for upc, producto, gtin in zip(conflictos['upc'], conflictos['producto'], conflictos['gtin']))
+    
+    def _reemplazar_catalogo(self, estadisticas, delta=False,
+                             max_fraccion_eliminada=MAX_FRACCION_ELIMINADA):
+        """
+        Sustituye el catálogo completo por el contenido de productos_staging:
+        borra los productos que no vienen en el archivo y fusiona el resto.
+        Ambos pasos ocurren en la misma transacción, así que otras conexiones
+        ven el catálogo anterior o el nuevo, nunca una mezcla.
+        
+        Antes de tocar productos se valida que el archivo tenga productos y que
+        no elimine más de `max_fraccion_eliminada` del catálogo actual
+        (un archivo truncado no debe vaciar el inventario).
+        """
+        cursor = self.conn.cursor()
+        
+        cursor.execute('SELECT COUNT(*) FROM temp.productos_staging')
+        if cursor.fetchone()[0] == 0:
+            raise ValueError('El archivo no contiene productos válidos; no se reemplazó el catálogo')
+        
+        # Un producto sigue en el catálogo si el archivo trae su UPC o el mismo GTIN con otra forma
+        cursor.execute(f'''
+            SELECT COUNT(*), SUM({SQL_FUERA_DE_STAGING})
             FROM productos
-            WHERE UPPER(upc) LIKE UPPER(?)
-            ORDER BY upc
-        '''
+        ''')
+        actuales, eliminar = cursor.fetchone()
+        eliminar = eliminar or 0
+        if actuales and eliminar / actuales > max_fraccion_eliminada:
+            raise ValueError(f'El archivo eliminaría {eliminar} de {actuales} productos '
+                             f'(máximo {max_fraccion_eliminada:.0%}); no se reemplazó el catálogo')
+        
+        cursor.execute(f'DELETE FROM productos WHERE {SQL_FUERA_DE_STAGING}')
+        estadisticas['eliminados'] = cursor.rowcount
+        
+        self._fusionar_staging(estadisticas, delta)
+    
+    def _resultado_importacion(self, estadisticas, inicio):
+        """Arma el diccionario de resultado de una importación exitosa"""
+        self._actualizar_indice_memoria()
+        productos_procesados = estadisticas['productos_procesados']
+        duracion = time.perf_counter() - inicio
+        filas_por_segundo = productos_procesados / duracion if duracion > 0 else 0.0
         
-        cursor.execute(query, (f'%{upc_parcial}%',))
-        resultados = cursor.fetchall()
+        mensaje = f'Se importaron {productos_procesados} productos exitosamente'
+        if 'desaparecidos' in estadisticas:
+            mensaje += (f": {estadisticas['insertados']} nuevos, "
+                        f"{estadisticas['actualizados']} actualizados, "
+                        f"{estadisticas['sin_cambios']} sin cambios, "
+                        f"{estadisticas['desaparecidos']} ya no vienen en el archivo")
+        if 'eliminados' in estadisticas:
+            mensaje += f" ({estadisticas['eliminados']} productos eliminados del catálogo)"
+        if estadisticas.get('conflictos_gtin'):
+            mensaje += (f"; {len(estadisticas['conflictos_gtin'])} filas con el mismo GTIN-14 "
+                        f"que otra fila del archivo (se usó la última)")
+        if estadisticas.get('filas_sin_precio'):
+            mensaje += f"; {estadisticas['filas_sin_precio']} filas sin precio omitidas"
+        if estadisticas.get('rechazados'):
+            mensaje += (f"; {estadisticas['rechazados']} filas rechazadas, "
+                        f"ver {estadisticas['archivo_cuarentena']}")
         
+        return {
+            'success': True,
+            **estadisticas,
+            'duracion_segundos': duracion,
+            'filas_por_segundo': filas_por_segundo,
+            'mensaje': f'{mensaje} ({filas_por_segundo:,.0f} filas/seg)'
+        }
+    
+    def _generacion(self):
+        """
+        Generación del catálogo para el caché de búsquedas: el contador propio,
+        que suben las importaciones y actualizar_precio, más PRAGMA data_version,
+        que cambia cuando otra conexión confirma cambios en la base
+        """
+        return self.generacion_catalogo, self._version_datos()
+    
+    def _consultar_con_cache(self, clave, consulta, formato='dict'):
+        """
+        Sirve `clave` desde el caché si su entrada es de la generación actual;
+        si no, ejecuta consulta() y guarda el resultado. Siempre retorna copias
+        en `formato` (ver producto_en_formato), así que modificar un resultado
+        no altera el caché.
+        """
+        fabrica_productos(formato)  # valida el formato antes de consultar
+        generacion = self._generacion()
+        encontrado, resultado = self.cache.obtener(clave, generacion)
+        if not encontrado:
+            resultado = consulta()
+            self.cache.guardar(clave, generacion, resultado)
+        
+        if isinstance(resultado, list):
+            return [producto_en_formato(producto, formato) for producto in resultado]
+        return producto_en_formato(resultado, formato)
+    
+    def estadisticas_cache(self):
+        """Estadísticas del caché de búsquedas (ver CacheLRU.estadisticas)"""
+        return {**self.cache.estadisticas(), 'generacion_catalogo': self.generacion_catalogo}
+    
+    def actualizar_precio(self, upc, precio):
+        """
+        Actualiza el precio de un producto por UPC exacto
+        Retorna True si el producto existe. La huella se borra para que la
+        siguiente importación delta vuelva a escribir el producto.
+        """
+        def escribir():
+            cursor = self.conn.cursor()
+            cursor.execute('UPDATE productos SET precio = ?, huella = NULL WHERE upc = ?', (precio, upc))
+            return cursor.rowcount
+        
+        actualizados = escribir_con_reintentos(self, escribir)
+        self.generacion_catalogo += 1
+        return actualizados > 0
+    
+    def activar_indice_memoria(self):
+        """
+        Construye el índice de trigramas en memoria (ver IndiceUPC)
+        con todos los UPC del catálogo. Desde entonces buscar_por_upc_parcial
+        lo usa en lugar de consultar productos_upc_fts, y cada importación le
+        agrega los productos nuevos. Retorna el índice.
+        """
+        self.version_indice_upc = self._version_datos()
+        self.indice_upc = IndiceUPC.desde_conexion(self.conn)
+        return self.indice_upc
+    
+    def _version_datos(self):
+        """PRAGMA data_version: cambia cuando otra conexión confirma cambios en la base"""
+        cursor = self.conn.cursor()
+        cursor.execute('PRAGMA data_version')
+        return cursor.fetchone()[0]
+    
+    def _actualizar_indice_memoria(self):
+        """Agrega al índice en memoria (si está activo) los productos insertados"""
+        if self.indice_upc is not None:
+            self.version_indice_upc = self._version_datos()
+            self.indice_upc.actualizar(self.conn)
+    
+    def _sincronizar_indice_memoria(self):
+        """
+        Agrega al índice en memoria los productos que insertaron otras
+        conexiones o procesos (ej: otra caja que importó), si data_version
+        cambió desde la última revisión. Los productos que ellas borraron se
+        omiten solos en _obtener_productos_por_ids.
+        """
+        version = self._version_datos()
+        if version != self.version_indice_upc:
+            self.version_indice_upc = version
+            self.indice_upc.actualizar(self.conn)
+    
+    def _obtener_productos_por_ids(self, ids, limite=None):
+        """
+        Obtiene los productos con esos productos.id, en el mismo orden, hasta
+        `limite`. Los que ya no existen (borrados al reemplazar el catálogo) se omiten.
+        """
+        cursor = self.conn.cursor()
         productos = []
-        for row in resultados:
-            productos.append({
-                'upc': row[0],
-                'producto': row[1],
-                'precio': row[2],
-                'qty': row[3]
-            })
+        
+        for inicio in range(0, len(ids), TAMANO_LOTE_IN):
+            lote = ids[inicio:inicio + TAMANO_LOTE_IN]
+            marcadores = ','.join('?' * len(lote))
+            cursor.execute(f'''
+                SELECT id, upc, producto, precio, qty
+                FROM productos
+                WHERE id IN ({marcadores})
+            ''', lote)
+            por_id = {row[0]: row for row in cursor.fetchall()}
+            productos.extend(
+                {'upc': row[1], 'producto': row[2], 'precio': row[3], 'qty': row[4]}
+                for row in (por_id.get(id_producto) for id_producto in lote) if row
+            )
+            if limite is not None and len(productos) >= limite:
+                return productos[:limite]
         
         return productos
     
-    def obtener_producto_por_upc(self, upc):
-        """Obtiene un producto específico por UPC exacto"""
+    def buscar_por_upc_parcial(self, upc_parcial, modo='contiene', limite=None, formato='dict'):
+        """
+        Busca productos por UPC parcial (case-insensitive)
+        Retorna lista de productos que coincidan, como máximo `limite`, en
+        `formato` ('dict', 'tupla' o 'registro')
+        
+        Los resultados se sirven del caché LRU mientras el catálogo no cambie
+        (ver _consultar_con_cache); la búsqueda en sí está en _buscar_por_upc_parcial.
+        """
+        if modo not in MODOS_BUSQUEDA_UPC:
+            raise ValueError(f"Modo de búsqueda inválido: '{modo}'")
+        
+        return self._consultar_con_cache(
+            ('parcial', upc_parcial, modo, limite),
+            lambda: self._buscar_por_upc_parcial(upc_parcial, modo, limite),
+            formato)
+    
+    def _buscar_por_upc_parcial(self, upc_parcial, modo='contiene', limite=None):
+        """
+        Búsqueda de buscar_por_upc_parcial, sin caché
+        
+        Con SQLite 3.34 o posterior la búsqueda usa el índice de trigramas
+        productos_upc_fts en lugar de recorrer toda la tabla. El LIKE de un
+        índice trigram tampoco distingue mayúsculas, así que el resultado es
+        el mismo que el de la consulta sin índice.
+        
+        Con modo='prefijo' primero vienen el UPC exacto y los que empiezan con
+        el texto (ver _buscar_por_prefijo_upc) y después los que solo lo contienen.
+        
+        Con el índice en memoria activo (ver activar_indice_memoria) la
+        subcadena se busca ahí y a SQLite solo se le piden las filas encontradas.
+        Los textos con % o _ siguen yendo a SQLite, donde son comodines.
+        """
+        if modo == 'prefijo':
+            return self._buscar_por_prefijo_upc(upc_parcial, limite)
+        
+        if self.indice_upc is not None and not set('%_') & set(upc_parcial):
+            self._sincronizar_indice_memoria()
+            productos = self._obtener_productos_por_ids(self.indice_upc.buscar(upc_parcial), limite)
+            if limite is None:
+                productos.sort(key=lambda producto: producto['upc'])
+            return productos
+        
+        return list(self.iterar_busqueda_upc(upc_parcial, limite=limite))
+    
+    def iterar_busqueda_upc(self, upc_parcial, despues_de_upc=None, limite=None, formato='dict',
+                            arraysize=FILAS_POR_LECTURA):
+        """
+        Versión generadora de buscar_por_upc_parcial (modo 'contiene', sin caché
+        ni índice en memoria): entrega los productos en orden de UPC conforme los
+        lee del cursor, de `arraysize` en `arraysize`, sin armar la lista completa.
+        
+        Para paginar, pase en `despues_de_upc` el último UPC de la página anterior
+        (paginación por llave: cada página es un rango del índice, sin OFFSET).
+        `formato` es 'dict', 'tupla' o 'registro' (ver fabrica_productos).
+        """
+        # Búsqueda insensible a mayúsculas/minúsculas. Con menos de 3 caracteres
+        # no hay trigramas que buscar: recorrer productos en orden de UPC es
+        # igual de rápido y termina en cuanto se llena el límite
+        if FTS_TRIGRAMA and len(upc_parcial) >= 3:
+            query = '''
+                SELECT p.upc, p.producto, p.precio, p.qty
+                FROM productos_upc_fts
+                JOIN productos p ON p.id = productos_upc_fts.rowid
+                WHERE productos_upc_fts.upc LIKE ? AND p.upc > ?
+                ORDER BY p.upc
+                LIMIT ?
+            '''
+        else:
+            query = '''
+                SELECT upc, producto, precio, qty
+                FROM productos
+                WHERE UPPER(upc) LIKE UPPER(?) AND upc > ?
+                ORDER BY upc
+                LIMIT ?
+            '''
+        
+        return self._iterar_consulta(
+            query, (f'%{upc_parcial}%', despues_de_upc or '', -1 if limite is None else limite),
+            formato, arraysize)
+    
+    def _iterar_consulta(self, query, parametros, formato='dict', arraysize=FILAS_POR_LECTURA):
+        """
+        Genera las filas de una consulta de productos convertidas a `formato`,
+        leyendo el cursor con fetchmany(arraysize). El cursor se cierra al
+        terminar o al cerrar el generador; mientras esté abierto mantiene una
+        lectura activa en la base, así que conviene consumirlo o cerrarlo.
+        """
+        fabrica = fabrica_productos(formato)
+        
+        def generar():
+            cursor = self.conn.cursor()
+            cursor.row_factory = fabrica
+            cursor.arraysize = arraysize
+            try:
+                # En SQLite LIMIT -1 significa sin límite
+                cursor.execute(query, parametros)
+                while True:
+                    filas = cursor.fetchmany()
+                    if not filas:
+                        break
+                    yield from filas
+            finally:
+                cursor.close()
+        
+        return generar()
+    
+    def _buscar_por_prefijo_upc(self, upc_parcial, limite=None):
+        """
+        Búsqueda por prefijo de UPC ordenada por relevancia: coincidencia exacta,
+        luego UPC que empiezan con el texto y al final UPC que solo lo contienen
+        
+        Las dos primeras son un solo rango sobre idx_productos_upc_nocase, que
+        ya sale ordenado (el UPC exacto es el menor del rango). La búsqueda por
+        subcadena solo se hace si el rango no llena `limite`.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT upc, producto, precio, qty
+            FROM productos
+            WHERE upc COLLATE NOCASE >= ? AND upc COLLATE NOCASE < ?
+            ORDER BY upc COLLATE NOCASE
+            LIMIT ?
+        ''', (upc_parcial, upc_parcial + FIN_PREFIJO, -1 if limite is None else limite))
+        
+        productos = [
+            {'upc': row[0], 'producto': row[1], 'precio': row[2], 'qty': row[3]}
+            for row in cursor.fetchall()
+        ]
+        if limite is not None and len(productos) >= limite:
+            return productos
+        
+        # Completar con los que contienen el texto en otra posición
+        encontrados = {producto['upc'] for producto in productos}
+        faltantes = None if limite is None else limite - len(productos)
+        contienen = self._buscar_por_upc_parcial(
+            upc_parcial, limite=None if limite is None else faltantes + len(encontrados))
+        productos.extend(producto for producto in contienen if producto['upc'] not in encontrados)
+        
+        return productos if limite is None else productos[:limite]
+    
+    def buscar_por_nombre(self, texto, limite=LIMITE_BUSQUEDA_NOMBRE):
+        """
+        Busca productos por palabras de su nombre, sin distinguir mayúsculas ni
+        acentos ('platano' encuentra 'PLÁTANO'). Cada palabra funciona como
+        prefijo ('agua' encuentra 'AGUACATE') y deben aparecer todas.
+        Retorna como máximo `limite` productos, los más relevantes (bm25) primero.
+        """
+        palabras = re.findall(r'\w+', texto)
+        if not palabras:
+            return []
+        
         cursor = self.conn.cursor()
         
+        if FTS_NOMBRES:
+            # Cada palabra entre comillas para que no se interprete como sintaxis FTS5
+            consulta = ' '.join('"' + palabra.replace('"', '""') + '"*' for palabra in palabras)
+            cursor.execute('''
+                SELECT p.upc, p.producto, p.precio, p.qty
+                FROM productos_nombre_fts
+                JOIN productos p ON p.id = productos_nombre_fts.rowid
+                WHERE productos_nombre_fts MATCH ?
+                ORDER BY bm25(productos_nombre_fts), p.producto
+                LIMIT ?
+            ''', (consulta, limite))
+        else:
+            condiciones = ' AND '.join(['producto LIKE ?'] * len(palabras))
+            cursor.execute(f'''
+                SELECT upc, producto, precio, qty
+                FROM productos
+                WHERE {condiciones}
+                ORDER BY producto
+                LIMIT ?
+            ''', [f'%{palabra}%' for palabra in palabras] + [limite])
+        
+        return [
+            {'upc': row[0], 'producto': row[1], 'precio': row[2], 'qty': row[3]}
+            for row in cursor.fetchall()
+        ]
+    
+    def obtener_producto_por_upc(self, upc, formato='dict'):
+        """
+        Obtiene un producto por UPC exacto o, si no existe tal cual, por su forma
+        normalizada a GTIN-14 (un EAN-13 con 0 inicial o un UPC-A sin su 0 inicial
+        encuentran el mismo producto). `formato` es 'dict', 'tupla' o 'registro'.
+        """
+        return self._consultar_con_cache(
+            ('upc', upc), lambda: self._obtener_producto_por_upc(upc), formato)
+    
+    def _obtener_producto_por_upc(self, upc):
+        """Búsqueda de obtener_producto_por_upc, sin caché"""
+        cursor = self.conn.cursor()
+        
+        # Una sola consulta: SQLite resuelve el OR con los índices de upc y gtin
         cursor.execute('''
             SELECT upc, producto, precio, qty
             FROM productos
-            WHERE upc = ?
-        ''', (upc,))
+            WHERE upc = ? OR gtin = ?
+            ORDER BY upc = ? DESC
+            LIMIT 1
+        ''', (upc, normalizar_gtin(upc), upc))
         
         row = cursor.fetchone()
         if row:
@@ -181,27 +2206,81 @@ class InventarioManager:
             }
         return None
     
-    def obtener_todos_productos(self):
-        """Obtiene todos los productos del inventario"""
+    def obtener_productos_por_upcs(self, upcs):
+        """
+        Resuelve una lista de UPC escaneados (con repeticiones, ej: las líneas de
+        un archivo de lector de mano) con consultas por lotes de TAMANO_LOTE_IN
+        en vez de una consulta por escaneo. Cada código se busca igual que en
+        obtener_producto_por_upc: exacto y, si no existe, normalizado a GTIN-14.
+        
+        Retorna un diccionario UPC del catálogo -> producto con la llave
+        'cantidad' (veces que se escaneó, sumando las distintas formas del mismo
+        código), en el orden del primer escaneo. Los códigos que no existen
+        quedan con valor None.
+        """
+        escaneos = Counter()
+        for codigo in upcs:
+            codigo = str(codigo).strip() if codigo is not None else ''
+            if codigo:
+                escaneos[codigo] += 1
+        
         cursor = self.conn.cursor()
+        por_upc = {}
+        por_gtin = {}
         
-        cursor.execute('''
-            SELECT upc, producto, precio, qty
-            FROM productos
-            ORDER BY upc
-        ''')
+        def consultar(columna, valores, encontrados):
+            for inicio in range(0, len(valores), TAMANO_LOTE_IN):
+                lote = valores[inicio:inicio + TAMANO_LOTE_IN]
+                marcadores = ','.join('?' * len(lote))
+                cursor.execute(f'''
+                    SELECT {columna}, upc, producto, precio, qty
+                    FROM productos
+                    WHERE {columna} IN ({marcadores})
+                ''', lote)
+                for row in cursor.fetchall():
+                    encontrados[row[0]] = {'upc': row[1], 'producto': row[2], 'precio': row[3], 'qty': row[4]}
         
-        productos = []
-        for row in cursor.fetchall():
-            productos.append({
-                'upc': row[0],
-                'producto': row[1],
-                'precio': row[2],
-                'qty': row[3]
-            })
+        # Primero los UPC exactos; solo los que faltan se buscan por GTIN
+        consultar('upc', list(escaneos), por_upc)
+        gtins = {codigo: normalizar_gtin(codigo) for codigo in escaneos if codigo not in por_upc}
+        consultar('gtin', list({gtin for gtin in gtins.values() if gtin}), por_gtin)
+        
+        productos = {}
+        for codigo, cantidad in escaneos.items():
+            producto = por_upc.get(codigo) or por_gtin.get(gtins.get(codigo))
+            if producto is None:
+                productos[codigo] = None
+            elif producto['upc'] in productos:
+                productos[producto['upc']]['cantidad'] += cantidad
+            else:
+                productos[producto['upc']] = {**producto, 'cantidad': cantidad}
         
         return productos
     
+    def obtener_todos_productos(self, formato='dict'):
+        """Obtiene todos los productos del inventario en `formato` ('dict', 'tupla' o 'registro')"""
+        with _recolector_pausado():
+            return list(self.iterar_productos(formato=formato))
+    
+    def iterar_productos(self, despues_de_upc=None, limite=None, formato='dict',
+                         arraysize=FILAS_POR_LECTURA):
+        """
+        Versión generadora de obtener_todos_productos: entrega los productos en
+        orden de UPC de `arraysize` en `arraysize`, sin armar la lista completa.
+        
+        Para paginar (ej: 50 por pantalla), pase en `despues_de_upc` el último UPC
+        de la página anterior y `limite`; la página es un rango del índice único
+        de upc, igual de rápida al principio que al final del catálogo.
+        `formato` es 'dict', 'tupla' o 'registro' (ver fabrica_productos).
+        """
+        return self._iterar_consulta('''
+            SELECT upc, producto, precio, qty
+            FROM productos
+            WHERE upc > ?
+            ORDER BY upc
+            LIMIT ?
+        ''', (despues_de_upc or '', -1 if limite is None else limite), formato, arraysize)
+    
     def cerrar(self):
         """Cierra la conexión a la base de datos"""
         if self.conn:
@@ -11,6 +11,12 @@ from datetime import datetime
 from inventario import InventarioManager
 from facturacion import FacturaManager
 
+# Máximo de productos mostrados al buscar un item de la factura
+LIMITE_RESULTADOS_FACTURA = 20
+
+# Máximo de coincidencias por nombre en la búsqueda de productos
+LIMITE_RESULTADOS_NOMBRE = 50
+
 
 def mostrar_menu_principal():
     """Muestra el menú principal"""
@@ -18,7 +24,7 @@ def mostrar_menu_principal():
     print(" EL MEXIQUENSE MARKET - Sistema de Facturación ".center(60))
     print("="*60)
     print("\n1. Importar productos desde CSV/Excel")
-    print("2. Buscar productos por UPC parcial")
+    print("2. Buscar productos por UPC o nombre")
     print("3. Crear nueva factura")
     print("4. Ver facturas generadas")
     print("5. Exportar factura existente")
@@ -31,6 +37,8 @@ def importar_productos(inventario):
     print("\n--- IMPORTAR PRODUCTOS ---")
     print("\n1. Importar desde CSV")
     print("2. Importar desde Excel")
+    print("3. Importar CSV grande por bloques")
+    print("4. Importar todos los archivos de una carpeta")
     
     opcion = input("\nSeleccione opción: ").strip()
     
@@ -40,7 +48,20 @@ def importar_productos(inventario):
             print(f"\n❌ Error: Archivo no encontrado: {archivo}")
             return
         
-        resultado = inventario.importar_desde_csv(archivo)
+        delta = input("¿Importar solo productos nuevos o con cambios? (s/n): ").strip().lower() == 's'
+        reemplazar = input("¿Reemplazar el catálogo completo? Se borran los productos "
+                           "que no vienen en el archivo (s/n): ").strip().lower() == 's'
+        resultado = inventario.importar_desde_csv(archivo, delta=delta, reemplazar=reemplazar,
+                                                  progreso=mostrar_progreso)
+        
+        # Un reemplazo que borraría más de la mitad del catálogo se rechaza por si el
+        # archivo viene incompleto; se puede forzar si el usuario lo confirma
+        if reemplazar and not resultado['success'] and 'eliminaría' in resultado['error']:
+            print(f"\n⚠️  {resultado['error']}")
+            if input("¿El archivo está completo y desea reemplazar de todos modos? (s/n): ").strip().lower() == 's':
+                resultado = inventario.importar_desde_csv(archivo, delta=delta, reemplazar=True,
+                                                          progreso=mostrar_progreso,
+                                                          max_fraccion_eliminada=1.0)
         
     elif opcion == "2":
         archivo = input("Ruta del archivo Excel: ").strip()
@@ -48,35 +69,98 @@ def importar_productos(inventario):
             print(f"\n❌ Error: Archivo no encontrado: {archivo}")
             return
         
-        sheet_name = input("Nombre de la hoja (por defecto 'Sheet 1'): ").strip()
+        sheet_name = input("Nombre de la hoja (por defecto 'Sheet 1', '*' para todas): ").strip()
         if not sheet_name:
             sheet_name = 'Sheet 1'
+        elif sheet_name == '*':
+            sheet_name = None
+        
+        resultado = inventario.importar_desde_excel(archivo, sheet_name, progreso=mostrar_progreso)
+        
+    elif opcion == "3":
+        archivo = input("Ruta del archivo CSV: ").strip()
+        if not os.path.exists(archivo):
+            print(f"\n❌ Error: Archivo no encontrado: {archivo}")
+            return
         
-        resultado = inventario.importar_desde_excel(archivo, sheet_name)
+        filas_input = input("Filas por bloque (por defecto 50000): ").strip()
+        try:
+            filas_por_bloque = int(filas_input) if filas_input else 50000
+        except ValueError:
+            print("\n❌ Número de filas inválido")
+            return
+        
+        resultado = inventario.importar_desde_csv_por_bloques(archivo, filas_por_bloque,
+                                                              progreso=mostrar_progreso)
+        
+    elif opcion == "4":
+        ruta = input("Carpeta o patrón de archivos (ej: proveedores/*.csv): ").strip()
+        resultado = inventario.importar_archivos(ruta, progreso=mostrar_progreso)
+        print()
+        
+        for archivo in resultado.get('archivos', []):
+            if archivo['success']:
+                print(f"   ✅ {archivo['archivo']}: {archivo['productos_procesados']} productos")
+            else:
+                print(f"   ❌ {archivo['archivo']}: {archivo['error']}")
     else:
         print("\n❌ Opción no válida")
         return
     
     if resultado['success']:
         print(f"\n✅ {resultado['mensaje']}")
+        for motivo, cantidad in resultado.get('rechazos_por_motivo', {}).items():
+            print(f"   ⚠️  {motivo}: {cantidad} filas")
+        if resultado.get('filas_sin_precio'):
+            print(f"   ⚠️  Filas sin precio omitidas: {resultado['filas_sin_precio']}")
+        if 'reanudado_desde_fila' in resultado:
+            print(f"   ↪️  Reanudada desde la fila {resultado['reanudado_desde_fila']:,}")
+        tiempos = resultado.get('tiempos', {})
+        print("   ⏱️  " + ", ".join(f"{fase} {segundos:.2f}s" for fase, segundos in tiempos.items()))
     else:
         print(f"\n❌ Error: {resultado['error']}")
+        if resultado.get('filas_confirmadas'):
+            print(f"   Se confirmaron {resultado['filas_confirmadas']:,} filas; "
+                  "vuelva a importar el mismo archivo para continuar")
+
+
+def mostrar_progreso(avance):
+    """Muestra en una sola línea el avance de una importación"""
+    linea = f"\r   {avance['filas']:,} filas ({avance['filas_por_segundo']:,.0f} filas/seg"
+    if avance['eta_segundos'] is not None:
+        linea += f", {avance['fraccion']:.0%}, faltan {avance['eta_segundos']:.0f}s"
+    print(linea + ")   ", end='', flush=True)
+
+
+def buscar_por_upc_o_nombre(inventario, texto, modo='contiene', limite=None):
+    """
+    Busca productos por UPC parcial y, si el texto no es solo dígitos, también
+    por nombre. Primero van las coincidencias de UPC y después las de nombre.
+    """
+    productos = inventario.buscar_por_upc_parcial(texto, modo=modo, limite=limite)
+    
+    if not texto.isdigit():
+        encontrados = {producto['upc'] for producto in productos}
+        por_nombre = inventario.buscar_por_nombre(texto, limite or LIMITE_RESULTADOS_NOMBRE)
+        productos += [producto for producto in por_nombre if producto['upc'] not in encontrados]
+    
+    return productos[:limite] if limite else productos
 
 
 def buscar_productos(inventario):
-    """Busca productos por UPC parcial"""
+    """Busca productos por UPC parcial o nombre"""
     print("\n--- BUSCAR PRODUCTOS ---")
     
-    upc_parcial = input("\nIngrese UPC parcial (mínimo 3 caracteres): ").strip()
+    upc_parcial = input("\nIngrese UPC parcial o nombre (mínimo 3 caracteres): ").strip()
     
     if len(upc_parcial) < 3:
         print("\n❌ Error: Ingrese al menos 3 caracteres para buscar")
         return []
     
-    productos = inventario.buscar_por_upc_parcial(upc_parcial)
+    productos = buscar_por_upc_o_nombre(inventario, upc_parcial)
     
     if not productos:
-        print(f"\n❌ No se encontraron productos con UPC que contenga '{upc_parcial}'")
+        print(f"\n❌ No se encontraron productos con UPC o nombre '{upc_parcial}'")
         return []
     
     print(f"\n✅ Se encontraron {len(productos)} productos:\n")
@@ -119,50 +203,87 @@ def crear_factura(inventario, factura_manager):
     
     # Agregar productos
     print("\n--- AGREGAR PRODUCTOS ---")
-    print("(Ingrese 'fin' cuando termine de agregar productos)\n")
-    
-    numero_item = 1
+    print("(Ingrese 'fin' cuando termine de agregar productos, 'archivo' para cargar")
+    print(" un archivo de escaneos o 'quitar' para quitar un producto)\n")
     
     while True:
-        print(f"\n--- ITEM #{numero_item} ---")
+        # Un UPC repetido suma su cantidad a la misma línea, así que el número
+        # de item es el de líneas distintas
+        print(f"\n--- ITEM #{len(factura_manager.factura_actual) + 1} ---")
         
         # Buscar producto por UPC parcial
-        upc_busqueda = input("Ingrese UPC parcial (o 'fin' para terminar): ").strip()
+        upc_busqueda = input("Ingrese UPC parcial o nombre (o 'fin' para terminar): ").strip()
         
         if upc_busqueda.lower() == 'fin':
             break
         
-        if len(upc_busqueda) < 3:
-            print("❌ Ingrese al menos 3 caracteres para buscar")
+        if upc_busqueda.lower() == 'quitar':
+            upc_quitar = input("UPC del producto a quitar: ").strip()
+            item = factura_manager.quitar_item(upc_quitar)
+            if item:
+                print(f"✅ Quitado: {item['producto']} "
+                      f"(subtotal ${factura_manager.calcular_subtotal():.2f})")
+            else:
+                print(f"❌ El UPC '{upc_quitar}' no está en la factura")
             continue
         
-        # Buscar productos
-        productos_encontrados = inventario.buscar_por_upc_parcial(upc_busqueda)
-        
-        if not productos_encontrados:
-            print(f"❌ No se encontraron productos con UPC que contenga '{upc_busqueda}'")
-            continuar = input("¿Desea buscar otro producto? (s/n): ").strip().lower()
-            if continuar != 's':
-                break
+        if upc_busqueda.lower() == 'archivo':
+            archivo = input("Ruta del archivo de escaneos (un código por línea): ").strip()
+            resultado = factura_manager.agregar_items_escaneados(archivo, inventario)
+            if not resultado['success']:
+                print(f"❌ Error: {resultado['error']}")
+                continue
+            for item in resultado['items']:
+                print(f"✅ Agregado: {item['producto']} x {item['qty']:g} = ${item['total']:.2f}")
+            if resultado['no_encontrados']:
+                print(f"⚠️  {len(resultado['no_encontrados'])} códigos no encontrados: "
+                      f"{', '.join(resultado['no_encontrados'][:10])}")
+            for rechazado in resultado['rechazados']:
+                print(f"❌ {rechazado['error']}")
             continue
         
-        # Mostrar productos encontrados
-        print(f"\n✅ Se encontraron {len(productos_encontrados)} productos:\n")
-        for idx, prod in enumerate(productos_encontrados, 1):
-            print(f"{idx}. {prod['upc']} - {prod['producto']} - ${prod['precio']:.2f}")
+        if len(upc_busqueda) < 3:
+            print("❌ Ingrese al menos 3 caracteres para buscar")
+            continue
         
-        # Seleccionar producto
-        try:
-            seleccion = int(input("\nSeleccione número de producto: ").strip())
-            if seleccion < 1 or seleccion > len(productos_encontrados):
-                print("❌ Selección inválida")
+        # Un código escaneado completo (UPC-A, EAN-13 con 0 inicial, UPC sin su 0
+        # inicial) se resuelve con una sola consulta y se agrega sin lista de selección
+        producto_seleccionado = inventario.obtener_producto_por_upc(upc_busqueda)
+        if producto_seleccionado:
+            print(f"✅ {producto_seleccionado['upc']} - {producto_seleccionado['producto']} - "
+                  f"${producto_seleccionado['precio']:.2f}")
+        else:
+            # Buscar productos: primero los UPC que empiezan con el texto y al final
+            # las coincidencias por nombre
+            productos_encontrados = buscar_por_upc_o_nombre(
+                inventario, upc_busqueda, modo='prefijo', limite=LIMITE_RESULTADOS_FACTURA)
+            
+            if not productos_encontrados:
+                print(f"❌ No se encontraron productos con UPC o nombre '{upc_busqueda}'")
+                continuar = input("¿Desea buscar otro producto? (s/n): ").strip().lower()
+                if continuar != 's':
+                    break
                 continue
             
-            producto_seleccionado = productos_encontrados[seleccion - 1]
+            # Mostrar productos encontrados
+            print(f"\n✅ Se encontraron {len(productos_encontrados)} productos:\n")
+            for idx, prod in enumerate(productos_encontrados, 1):
+                print(f"{idx}. {prod['upc']} - {prod['producto']} - ${prod['precio']:.2f}")
+            if len(productos_encontrados) == LIMITE_RESULTADOS_FACTURA:
+                print(f"(se muestran los primeros {LIMITE_RESULTADOS_FACTURA}; escriba más dígitos para acotar)")
             
-        except ValueError:
-            print("❌ Entrada inválida")
-            continue
+            # Seleccionar producto
+            try:
+                seleccion = int(input("\nSeleccione número de producto: ").strip())
+                if seleccion < 1 or seleccion > len(productos_encontrados):
+                    print("❌ Selección inválida")
+                    continue
+                
+                producto_seleccionado = productos_encontrados[seleccion - 1]
+                
+            except ValueError:
+                print("❌ Entrada inválida")
+                continue
         
         # Obtener cantidad
         try:
@@ -178,16 +299,19 @@ def crear_factura(inventario, factura_manager):
             continue
         
         # Agregar item a la factura
-        item = factura_manager.agregar_item(
-            producto_seleccionado['upc'],
-            producto_seleccionado['producto'],
-            producto_seleccionado['precio'],
-            qty
-        )
-        
-        print(f"\n✅ Agregado: {item['producto']} x {item['qty']} = ${item['total']:.2f}")
+        try:
+            item = factura_manager.agregar_item(
+                producto_seleccionado['upc'],
+                producto_seleccionado['producto'],
+                producto_seleccionado['precio'],
+                qty
+            )
+        except ValueError as e:
+            print(f"❌ {e}")
+            continue
         
-        numero_item += 1
+        print(f"\n✅ Agregado: {item['producto']} x {item['qty']} = ${item['total']:.2f} "
+              f"(subtotal ${factura_manager.calcular_subtotal():.2f})")
     
     # Verificar si hay items
     if not factura_manager.factura_actual:
@@ -235,6 +359,12 @@ def crear_factura(inventario, factura_manager):
     # Guardar factura
     resultado = factura_manager.guardar_factura(fecha, cliente)
     
+    # Otra caja tuvo la base ocupada más de lo que esperan los reintentos
+    while not resultado['success'] and 'locked' in resultado['error']:
+        if input("\n⚠️  La base de datos está ocupada. ¿Reintentar? (s/n): ").strip().lower() != 's':
+            break
+        resultado = factura_manager.guardar_factura(fecha, cliente)
+    
     if resultado['success']:
         factura_id = resultado['factura_id']
         print(f"\n✅ Factura #{factura_id} guardada exitosamente")
@@ -357,9 +487,22 @@ def main():
     """Función principal"""
     print("\n¡Bienvenido al Sistema de Facturación!")
     
-    # Inicializar managers
-    inventario = InventarioManager('inventario.db')
-    factura_manager = FacturaManager('inventario.db')
+    # Inicializar managers; con --concurrente varias cajas pueden usar la misma base
+    concurrente = '--concurrente' in sys.argv[1:]
+    inventario = InventarioManager('inventario.db', concurrente=concurrente)
+    factura_manager = FacturaManager('inventario.db', descontar_inventario=True,
+                                     concurrente=concurrente)
+    
+    migracion = inventario.migracion_productos
+    if migracion and migracion['upcs_corregidos']:
+        print(f"✅ Se corrigieron {migracion['upcs_corregidos']} UPC guardados como decimal")
+    if migracion and migracion['gtin_normalizados']:
+        print(f"✅ Se normalizaron {migracion['gtin_normalizados']} UPC a GTIN-14")
+    
+    # Índice de UPC en memoria (opcional): búsquedas más rápidas en catálogos grandes
+    if '--indice-memoria' in sys.argv[1:]:
+        indice = inventario.activar_indice_memoria()
+        print(f"Índice en memoria: {len(indice):,} UPC ({indice.memoria() / 2**20:,.1f} MiB)")
     
     try:
         while True:
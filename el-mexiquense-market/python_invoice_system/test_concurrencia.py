@@ -0,0 +1,67 @@
+"""
+Prueba de varias cajas (procesos) guardando facturas en la misma base
+
+Ejecutar desde esta carpeta con:
+    python -m unittest test_concurrencia
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from benchmarks import correr_estres
+
+
+# Pocas cajas y ~100 facturas: suficiente para que las escrituras choquen
+CAJAS = 3
+FACTURAS_POR_CAJA = 34
+# Existencia baja para que algunas facturas se rechacen por inventario insuficiente
+EXISTENCIA = 20
+
+
+class TestConcurrencia(unittest.TestCase):
+    
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        shutil.rmtree(self.directorio)
+    
+    def estres(self, **opciones):
+        db_path = os.path.join(self.directorio, 'concurrencia.db')
+        return correr_estres(db_path, FACTURAS_POR_CAJA, opciones, cajas=CAJAS,
+                             existencia=EXISTENCIA)
+    
+    def verificar_cuadre(self, estres):
+        # Cada factura guardada por una caja está en la base, con su total
+        self.assertEqual(estres['facturas_db'], estres['guardadas'])
+        self.assertEqual(estres['total_db'], estres['total_centavos'])
+        # Existencia final = inicial - vendido, producto por producto, y ninguna negativa
+        for upc, milesimas in estres['existencias'].items():
+            self.assertEqual(milesimas, estres['existencia_inicial'] - estres['vendido'].get(upc, 0), upc)
+            self.assertGreaterEqual(milesimas, 0, upc)
+    
+    def test_ninguna_venta_se_pierde(self):
+        estres = self.estres(concurrente=True)
+        
+        self.assertEqual(estres['errores'], [])
+        # Toda factura se guardó o se rechazó por existencia; ninguna se perdió
+        self.assertEqual(estres['fallidas'], 0)
+        self.assertEqual(estres['guardadas'] + estres['rechazadas'], estres['intentadas'])
+        self.assertGreater(estres['guardadas'], 0)
+        self.verificar_cuadre(estres)
+    
+    def test_cuadra_aun_con_reintentos_agotados(self):
+        # Con busy_timeout de 1 ms algunas facturas pueden agotar los reintentos
+        # y fallar, pero lo que sí se guardó debe cuadrar
+        estres = self.estres(concurrente=True, espera_bloqueo=0.001)
+        
+        self.assertTrue(all('locked' in error for error in estres['errores']), estres['errores'])
+        self.assertEqual(estres['guardadas'] + estres['rechazadas'] + estres['fallidas'],
+                         estres['intentadas'])
+        self.verificar_cuadre(estres)
+
+
+if __name__ == '__main__':
+    unittest.main()
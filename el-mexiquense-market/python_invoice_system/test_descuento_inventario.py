@@ -0,0 +1,94 @@
+"""
+Prueba del descuento de inventario al guardar facturas
+
+Ejecutar desde esta carpeta con:
+    python -m unittest test_descuento_inventario
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from inventario import InventarioManager
+import facturacion
+from facturacion import FacturaManager
+
+
+CATALOGO = """UPC,QTY,PRODUCT,PRICE,TOTAL
+070038372806,6,Best Choice Grade A Large Egg 12 ct.,$1.90,$11.40
+041303001813,10,TORTILLAS DE HARINA,$2.50,$25.00
+"""
+
+
+class TestDescuentoInventario(unittest.TestCase):
+    
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.directorio_anterior = os.getcwd()
+        # Las importaciones dejan la carpeta de cuarentena en el directorio actual
+        os.chdir(self.directorio)
+        self.db_path = os.path.join(self.directorio, 'inventario.db')
+        self.csv_path = os.path.join(self.directorio, 'catalogo.csv')
+        with open(self.csv_path, 'w', encoding='utf-8') as f:
+            f.write(CATALOGO)
+        
+        self.inventario = InventarioManager(self.db_path)
+        self.facturas = FacturaManager(self.db_path, descontar_inventario=True)
+    
+    def tearDown(self):
+        self.facturas.conn.close()
+        self.inventario.conn.close()
+        os.chdir(self.directorio_anterior)
+        shutil.rmtree(self.directorio)
+    
+    def qty(self, upc):
+        return self.inventario.obtener_producto_por_upc(upc)['qty']
+    
+    def test_venta_descuenta_inventario(self):
+        self.inventario.importar_desde_csv(self.csv_path)
+        
+        self.facturas.agregar_item('070038372806', 'Best Choice Grade A Large Egg 12 ct.', 1.90, 2)
+        resultado = self.facturas.guardar_factura()
+        
+        self.assertTrue(resultado['success'])
+        self.assertEqual(self.qty('070038372806'), 4)
+        self.assertEqual(self.qty('041303001813'), 10)
+    
+    def test_reimportacion_delta_despues_de_venta(self):
+        self.inventario.importar_desde_csv(self.csv_path)
+        
+        self.facturas.agregar_item('070038372806', 'Best Choice Grade A Large Egg 12 ct.', 1.90, 2)
+        self.assertTrue(self.facturas.guardar_factura()['success'])
+        self.assertEqual(self.qty('070038372806'), 4)
+        
+        # El CSV no cambió, pero la venta sí cambió la qty: la importación delta
+        # debe volver a escribir el producto vendido y dejar el otro como estaba
+        resultado = self.inventario.importar_desde_csv(self.csv_path, delta=True)
+        
+        self.assertTrue(resultado['success'])
+        self.assertEqual(self.qty('070038372806'), 6)
+        self.assertEqual(self.qty('041303001813'), 10)
+        self.assertEqual(resultado['actualizados'], 1)
+        self.assertEqual(resultado['sin_cambios'], 1)
+    
+    def test_inventario_insuficiente(self):
+        self.inventario.importar_desde_csv(self.csv_path)
+        self.facturas.permitir_negativo = False
+        
+        self.facturas.agregar_item('070038372806', 'Best Choice Grade A Large Egg 12 ct.', 1.90, 7)
+        resultado = self.facturas.guardar_factura()
+        
+        self.assertFalse(resultado['success'])
+        self.assertIn('070038372806', resultado['error'])
+        self.assertEqual(self.qty('070038372806'), 6)
+
+
+@mock.patch.object(facturacion, 'DESCUENTO_UPDATE_FROM', False)
+class TestDescuentoInventarioSinUpdateFrom(TestDescuentoInventario):
+    """Las mismas pruebas con el descuento para SQLite anterior a 3.35"""
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+"""
+Prueba de la importación de Excel con y sin streaming
+
+Ejecutar desde esta carpeta con:
+    python -m unittest test_importacion_excel
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from openpyxl import Workbook
+
+from inventario import InventarioManager
+
+
+# UPC numéricos (como los guarda Excel) y una fila sin UPC, que con streaming
+# volvía decimal toda la columna del bloque
+FILAS = [
+    ('UPC', 'QTY', 'PRODUCT', 'PRICE', 'TOTAL'),
+    (70038372806, 6, 'Best Choice Grade A Large Egg 12 ct.', 1.90, 11.40),
+    (715141514643.0, 2, 'LECHE ENTERA', '$3.49', 6.98),
+    (None, 30, 'CILANTRO', 0.30, 9.00),
+]
+
+
+class TestImportacionExcel(unittest.TestCase):
+    
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.directorio_anterior = os.getcwd()
+        # Las importaciones dejan la carpeta de cuarentena en el directorio actual
+        os.chdir(self.directorio)
+        self.excel_path = os.path.join(self.directorio, 'catalogo.xlsx')
+        libro = Workbook()
+        hoja = libro.active
+        hoja.title = 'Sheet 1'
+        for fila in FILAS:
+            hoja.append(fila)
+        libro.save(self.excel_path)
+    
+    def tearDown(self):
+        os.chdir(self.directorio_anterior)
+        shutil.rmtree(self.directorio)
+    
+    def importar(self, streaming):
+        inventario = InventarioManager(os.path.join(self.directorio, f'streaming_{streaming}.db'))
+        try:
+            resultado = inventario.importar_desde_excel(self.excel_path, streaming=streaming)
+            self.assertTrue(resultado['success'], resultado.get('error'))
+            return inventario.conn.execute(
+                'SELECT upc, producto, precio, qty FROM productos ORDER BY upc').fetchall()
+        finally:
+            inventario.conn.close()
+    
+    def test_streaming_guarda_los_mismos_upc(self):
+        sin_streaming = self.importar(streaming=False)
+        con_streaming = self.importar(streaming=True)
+        
+        self.assertEqual(con_streaming, sin_streaming)
+        self.assertEqual([fila[0] for fila in con_streaming],
+                         ['70038372806', '715141514643', 'CILANTRO001'])
+
+
+if __name__ == '__main__':
+    unittest.main()